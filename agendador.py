@@ -0,0 +1,16 @@
+import time
+
+# --- AGENDADOR ALINHADO AO FECHAMENTO DAS VELAS ---
+def proximo_fechamento(agora, timeframe):
+    """Instante (epoch) em que fecha a vela que está em formação em `agora`."""
+    return (int(agora) // timeframe + 1) * timeframe
+
+def aguardar_fechamento(timeframe, atraso=0.3, relogio=time):
+    """Dorme até `atraso` segundos depois do próximo fechamento de vela, sem acumular
+    deriva entre ciclos. `relogio` é qualquer objeto com time() e sleep(), como o módulo
+    time ou o relógio do replay. Retorna o 'from' da vela que acabou de fechar."""
+    fechamento = proximo_fechamento(relogio.time(), timeframe)
+    while True:
+        falta = fechamento + atraso - relogio.time()
+        if falta <= 0: return fechamento - timeframe
+        relogio.sleep(falta)
@@ -1,11 +1,21 @@
+import glob
 import time
+import json
+import uuid
 import threading
-import pandas as pd
 import os
-from flask import Flask, jsonify, render_template, request
+import sys
+import zlib
+from flask import Flask, Response, jsonify, render_template, request
 from flask_cors import CORS
 from datetime import datetime
-from iqoptionapi.stable_api import IQ_Option
+import agendador
+import coleta
+import fonte
+import historico
+import metricas
+import sessoes
+import snapshot
 
 app = Flask(__name__)
 CORS(app)
@@ -15,185 +25,380 @@ PARES_BASE = ["EURUSD", "GBPUSD", "EURJPY", "AUDCAD", "USDCAD", "USDJPY", "EURGB
 PARES_PARA_CATALOGAR = PARES_BASE + [p + "-OTC" for p in PARES_BASE]
 TIMEFRANE_SEGUNDOS = 60
 QUANTIDADE_VELAS = 240
+# Gales contados em cada sinal (0 = só a mão); o painel monta uma coluna por nível
+MAX_GALE = int(os.environ.get("MAX_GALE", 2))
+WORKERS_BUSCA = 4
+# Sessões logadas mantidas entre ciclos (buscas em paralelo, uma por sessão) e o intervalo
+# (segundos) da checagem de saúde que reconecta as que caíram
+SESSOES_IQ = int(os.environ.get("SESSOES_IQ", 2))
+INTERVALO_SAUDE = 15
+TIMEOUT_BUSCA_PAR = 30
+ATRASO_FECHAMENTO = 0.3 # Segundos após o fechamento de cada vela para acordar o catalogador
+CICLO_COMPLETO = 5 # A cada quantos fechamentos todas as estratégias são recalculadas
+MINIMO_VELAS = 50
+# Timeframes (segundos) montados a partir das velas M1, sem buscas extras na API
+TIMEFRAMES_DERIVADOS = [int(tf) for tf in os.environ.get("TIMEFRAMES_DERIVADOS", "300,900").split(",") if tf.strip()]
+TIMEFRAMES = [TIMEFRANE_SEGUNDOS] + TIMEFRAMES_DERIVADOS
+DIR_CACHE_VELAS = os.environ.get("DIR_CACHE_VELAS", "cache_velas")
+# Processos para avaliar as estratégias fora do processo do servidor (0 = na thread do catalogador)
+PROCESSOS_CATALOGO = int(os.environ.get("PROCESSOS_CATALOGO", 0))
+ARQUIVO_SNAPSHOT = os.environ.get("ARQUIVO_SNAPSHOT", "resultados.json")
+# Assertividade dos últimos N sinais resolvidos de cada estratégia, publicada à parte no /api/recentes
+JANELAS_RECENTES = (20, 50, 100)
+ARQUIVO_RECENTES = os.environ.get("ARQUIVO_RECENTES", "recentes.json")
+# Próxima entrada de cada (par, timeframe, estratégia), republicada logo após a coleta de cada fechamento
+ARQUIVO_PROXIMOS = os.environ.get("ARQUIVO_PROXIMOS", "proximos.json")
+# Com CATALOGADOR_EXTERNO=1 os workers do gunicorn só leem o snapshot publicado pelo processo
+# catalogador (python app.py --catalogador), o único que fala com a IQ Option
+CATALOGADOR_EXTERNO = os.environ.get("CATALOGADOR_EXTERNO") == "1"
+INTERVALO_STREAM = 1 # Segundos entre verificações de nova versão no /api/stream
+# Cada conexão do /api/stream ocupa um worker (ou thread) enquanto o painel está aberto: com
+# workers sync (gunicorn -w 4) o painel usa o /api/dados com ETag. STREAM_PAINEL=1 só com -k gthread/gevent
+STREAM_PAINEL = os.environ.get("STREAM_PAINEL") == "1"
+# Parâmetros que fazem o /api/dados responder pelos índices do snapshot em vez do JSON inteiro
+FILTROS_DADOS = ('par', 'estrategia', 'timeframe', 'minimo', 'gale', 'limite', 'pagina')
+# Métricas do processo catalogador, gravadas a cada ciclo para os workers servirem no /api/metrics
+ARQUIVO_METRICAS = os.environ.get("ARQUIVO_METRICAS", "metricas.prom")
+# Com PERFIL_CICLO=1, POST /api/perfil pede o perfil por amostragem do próximo ciclo
+# (formato collapsed, para flame graph) e GET /api/perfil devolve o último capturado
+PERFIL_CICLO = os.environ.get("PERFIL_CICLO") == "1"
+ARQUIVO_PERFIL = os.environ.get("ARQUIVO_PERFIL", "perfil_ciclo.txt")
+# Varredura de parâmetros (/api/varredura) sobre as velas em DIR_CACHE_VELAS, uma por vez em
+# cada processo. O estado de cada job fica em DIR_VARREDURAS, visível a todos os workers
+PROCESSOS_VARREDURA = int(os.environ.get("PROCESSOS_VARREDURA", os.cpu_count() or 1))
+DIR_VARREDURAS = os.environ.get("DIR_VARREDURAS", "varreduras")
+VARREDURAS_GUARDADAS = 20
+# Linhas recalculadas em cada ciclo, guardadas em SQLite (WAL) para o /api/historico
+ARQUIVO_HISTORICO = os.environ.get("ARQUIVO_HISTORICO", "historico.db")
+LIMITE_HISTORICO = 10000 # Máximo de linhas por consulta sem agregação
 
-db_resultados = {"ultima_atualizacao": "Iniciando...", "dados": []}
-api_iq = None
+sessoes_iq = None  # sessoes.PoolSessoes da conta logada
+buffers_velas = {}
+buffers_derivados = {}  # par -> {timeframe: BufferVelas}
+estatisticas_recentes = {}  # (par, timeframe) -> {estrategia: EstatisticaMovel}
+proximas_entradas = {}  # (par, timeframe) -> linhas do proximos.proximas
+arquivos_velas = {}
+# Uma montagem (anexar + derivados + estatísticas + agenda) por par de cada vez; `montado_em`
+# guarda o início da última busca aplicada, para uma busca antiga não sobrescrever uma nova
+travas_pares = {}
+montado_em = {}
+# Pares cuja busca falhou: as linhas do último catálogo ficam no painel e o próximo ciclo
+# que os trouxer recalcula tudo deles (o parcial perderia as estratégias da vela que faltou)
+pares_a_recalcular = set()
+varredura_rodando = None  # id do job deste processo em andamento
+trava_varredura = threading.Lock()
+trava_buffers = threading.Lock()
 catalogador_rodando = False
+db_resultados = {"ultima_atualizacao": "Iniciando...", "dados": []}
+publicador = leitor_snapshot = publicador_recentes = leitor_recentes = None
+publicador_proximos = leitor_proximos = historico_resultados = None
+
+def iniciar():
+    # Abre os snapshots e o histórico e, sem catalogador externo, começa a carga do disco.
+    # Partida a quente: o último snapshot publicado (gravado a cada ciclo) já é servido ao
+    # subir, sem esperar login nem ciclo; as velas voltam do DIR_CACHE_VELAS. No modo externo
+    # os workers já servem o arquivo pelo leitor
+    global db_resultados, publicador, leitor_snapshot, publicador_recentes, leitor_recentes
+    global publicador_proximos, leitor_proximos, historico_resultados
+    publicador = snapshot.PublicadorSnapshot(ARQUIVO_SNAPSHOT, db_resultados, indexar=True, retomar=not CATALOGADOR_EXTERNO)
+    db_resultados = publicador.atual.conteudo
+    leitor_snapshot = snapshot.LeitorSnapshot(ARQUIVO_SNAPSHOT, db_resultados, indexar=True)
+    publicador_recentes = snapshot.PublicadorSnapshot(ARQUIVO_RECENTES, {"dados": []}, retomar=not CATALOGADOR_EXTERNO)
+    leitor_recentes = snapshot.LeitorSnapshot(ARQUIVO_RECENTES, {"dados": []})
+    publicador_proximos = snapshot.PublicadorSnapshot(ARQUIVO_PROXIMOS, {"dados": []}, retomar=not CATALOGADOR_EXTERNO)
+    leitor_proximos = snapshot.LeitorSnapshot(ARQUIVO_PROXIMOS, {"dados": []})
+    historico_resultados = historico.HistoricoResultados(ARQUIVO_HISTORICO)
+    if not CATALOGADOR_EXTERNO:
+        threading.Thread(target=carregar_do_arquivo, daemon=True).start()
+
+# --- MÉTRICAS ---
+TEMPO_BUSCA = metricas.REGISTRO.histograma("catalogador_busca_segundos", "Latência do get_candles por par.")
+TEMPO_MONTAGEM = metricas.REGISTRO.histograma(
+    "catalogador_montagem_segundos", "Tempo para anexar as velas ao buffer (com sinais) e gravar em disco, por par.")
+ERROS_BUSCA = metricas.REGISTRO.contador("catalogador_erros_busca_total", "Pares que ficaram sem velas no ciclo, por motivo.")
+TEMPO_CICLO = metricas.REGISTRO.histograma("catalogador_ciclo_segundos", "Duração do ciclo: busca, catálogo e publicação.")
+CICLOS = metricas.REGISTRO.contador("catalogador_ciclos_total", "Ciclos por tipo: completo, parcial (só as estratégias disparadas) ou erro (não publicado).")
+ATRASO_PUBLICACAO = metricas.REGISTRO.medidor("catalogador_atraso_publicacao_segundos", "Atraso do último snapshot em relação ao fechamento.")
+PARES_CATALOGADOS = metricas.REGISTRO.medidor("catalogador_pares_catalogados", "Pares com resultado no último ciclo.")
+TEMPO_HISTORICO = metricas.REGISTRO.histograma("catalogador_historico_segundos", "Tempo para gravar as linhas do ciclo no histórico.")
+
+# --- MÓDULOS DO CATÁLOGO ---
+# numpy, o motor e o que depende deles só são importados por quem cataloga (ou varre):
+# workers que só servem o snapshot (CATALOGADOR_EXTERNO=1) sobem sem eles
+catalogo = estatisticas = motor = processos = proximos = varredura = velas = None
+trava_modulos = threading.Lock()
+
+def carregar_modulos():
+    global catalogo, estatisticas, motor, processos, proximos, varredura, velas
+    with trava_modulos:
+        import catalogo, estatisticas, motor, processos, proximos, varredura, velas
 
 def conectar_api(email, senha):
-    api = IQ_Option(email, senha)
+    # Só o fonte: o login de um worker com CATALOGADOR_EXTERNO=1 não carrega o catálogo
+    api = fonte.abrir_cliente(email, senha)
     status, _ = api.connect()
     if status:
         api.change_balance("PRACTICE")
         return api
     return None
 
+def abrir_sessoes(email, senha):
+    # Pool com as sessões logadas; None se nenhuma conectou
+    pool = sessoes.PoolSessoes(conectar_api, email, senha, SESSOES_IQ, INTERVALO_SAUDE)
+    if pool.iniciar(): return pool
+    pool.encerrar()
+    return None
+
+def publicar_resultados(resultados):
+    global db_resultados
+    db_resultados = publicador.publicar(resultados).conteudo
+
+def snapshot_atual():
+    return leitor_snapshot.ler() if CATALOGADOR_EXTERNO else publicador.atual
+
+def publicar_recentes(ultima_atualizacao):
+    dados = [dict(par=par, timeframe=rotulo_timeframe(tf), estrategia=e.nome, **por_estrategia[e.nome].resumo())
+             for par in PARES_PARA_CATALOGAR for tf in TIMEFRAMES
+             for por_estrategia in [estatisticas_recentes.get((par, tf))] if por_estrategia
+             for e in motor.ESTRATEGIAS if e.nome in por_estrategia]
+    publicador_recentes.publicar({"ultima_atualizacao": ultima_atualizacao, "janelas": list(JANELAS_RECENTES), "dados": dados})
+
+def publicar_proximos(ultima_atualizacao):
+    dados = [linha for par in PARES_PARA_CATALOGAR for tf in TIMEFRAMES for linha in proximas_entradas.get((par, tf), [])]
+    dados.sort(key=lambda linha: linha["entrada"])
+    # O relógio do catalogador vai junto (com a hora real da publicação) para os workers
+    # externos contarem `faltam` no mesmo relógio, inclusive no replay
+    publicador_proximos.publicar({"ultima_atualizacao": ultima_atualizacao, "dados": dados,
+                                  "relogio": fonte.relogio.time(), "real": time.time()})
+
+def rotulo_timeframe(timeframe):
+    return f"M{timeframe // 60}"
+
+def buffer_do_par(par, timeframe, quantidade):
+    # Na primeira vez, o buffer já nasce com as velas guardadas em disco, e os dos
+    # timeframes derivados com o histórico M1 do disco reamostrado
+    with trava_buffers:
+        if par not in buffers_velas:
+            arquivo = arquivos_velas[par] = velas.ArquivoVelas(DIR_CACHE_VELAS, par, timeframe)
+            travas_pares[par] = threading.Lock()
+            buffers_velas[par] = velas.BufferVelas(quantidade, timeframe)
+            buffers_velas[par].anexar(arquivo.ler(quantidade))
+            buffers_derivados[par] = {}
+            for tf in TIMEFRAMES_DERIVADOS:
+                derivado = buffers_derivados[par][tf] = velas.BufferVelas(quantidade, tf)
+                derivado.anexar(velas.reamostrar(arquivo.ler((quantidade + 1) * tf // timeframe), tf, descartar_inicio=True))
+        return buffers_velas[par]
+
+def atualizar_derivados(par, buffer):
+    # Só reamostra as velas M1 a partir da última vela (talvez incompleta) de cada timeframe.
+    # Um primeiro grupo cortado só vale se continua essa vela; senão o buffer M1 começa
+    # no meio de uma vela que o timeframe nunca viu inteira e ela é descartada
+    for tf, derivado in buffers_derivados[par].items():
+        colunas = buffer.colunas(desde=derivado.ultimo_timestamp)
+        continua = len(colunas['from']) > 0 and colunas['from'][0] // tf * tf == derivado.ultimo_timestamp
+        derivado.anexar(velas.reamostrar(colunas, tf, descartar_inicio=not continua))
+
+def atualizar_estatisticas(par, buffer):
+    # Conta nas janelas móveis só os sinais que se resolveram desde o último fechamento
+    agora = fonte.relogio.time()
+    for tf, alvo in [(buffer.timeframe, buffer)] + list(buffers_derivados[par].items()):
+        estatisticas.atualizar(estatisticas_recentes.setdefault((par, tf), {}), alvo, agora, MAX_GALE, JANELAS_RECENTES)
+
+def atualizar_proximos(par, buffer):
+    agora = fonte.relogio.time()
+    for tf, alvo in [(buffer.timeframe, buffer)] + list(buffers_derivados[par].items()):
+        proximas_entradas[(par, tf)] = [dict(linha, par=par, timeframe=rotulo_timeframe(tf))
+                                        for linha in proximos.proximas(alvo, agora)]
+
 def buscar_velas(api, par, timeframe, quantidade):
     try:
-        velas_raw = api.get_candles(par, timeframe, quantidade, time.time())
-        if not velas_raw or len(velas_raw) < 50: return None
-        df = pd.DataFrame(velas_raw)
-        df.rename(columns={'open':'open', 'close':'close', 'from':'timestamp'}, inplace=True)
-        df['cor'] = 'DOJI'
-        df.loc[df['close'] > df['open'], 'cor'] = 'VERDE'
-        df.loc[df['close'] < df['open'], 'cor'] = 'VERMELHA'
-        df.set_index('timestamp', inplace=True)
-        return df
-    except: return None
-
-# --- AUXILIARES ---
-def get_minority(cores):
-    v, r = cores.count('VERDE'), cores.count('VERMELHA')
-    return 'CALL' if v < r else 'PUT' if r < v else 'NONE'
-
-def get_majority(cores):
-    v, r = cores.count('VERDE'), cores.count('VERMELHA')
-    return 'CALL' if v > r else 'PUT' if r > v else 'NONE'
-
-# --- PROCESSAMENTO DAS ESTRATÉGIAS ---
-def processar_estrategias(df, par):
-    resultados_par = []
-    
-    def mhi1():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]); 
-            if dt.minute % 5 == 4:
-                padrao = [df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1], df_m['cor'].iloc[i]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
-        return df_m, "MHI 1", padrao
-
-    def mhi2():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 0:
-                padrao = [df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
-        return df_m, "MHI 2", padrao
-
-    def mhi3():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 1:
-                padrao = [df_m['cor'].iloc[i-4], df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
-        return df_m, "MHI 3", padrao
-
-    def r7():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(7, len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 0:
-                padrao = [df_m['cor'].iloc[i-7], df_m['cor'].iloc[i-6]]
-                if padrao[0] == padrao[1] and padrao[0] != 'DOJI':
-                    df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL' if padrao[0] == 'VERDE' else 'PUT'
-        return df_m, "R7", padrao
-
-    def torres():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(3, len(df_m)):
-            padrao = list(df_m['cor'].iloc[i-3:i+1])
-            sinal = 'NONE'
-            if padrao[0] == 'VERMELHA' and all(x == 'VERDE' for x in padrao[1:]): sinal = 'PUT'
-            elif padrao[0] == 'VERDE' and all(x == 'VERMELHA' for x in padrao[1:]): sinal = 'CALL'
-            df_m.iloc[i, df_m.columns.get_loc('sinal')] = sinal
-        return df_m, "Torres Gemeas", padrao
-
-    def p3x1():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 3:
-                padrao = [df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
-        return df_m, "Padrao 3x1", padrao
-
-    def p23():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 0:
-                padrao = [df_m['cor'].iloc[i]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL' if padrao[0] == 'VERDE' else 'PUT'
-        return df_m, "Padrao 23", padrao
-
-    def mosqueteiros():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 2:
-                padrao = [df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1], df_m['cor'].iloc[i]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_majority(padrao)
-        return df_m, "Tres Mosqueteiros", padrao
-
-    def melhor3():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(5, len(df_m)):
-            dt = datetime.fromtimestamp(df_m.index[i]);
-            if dt.minute % 5 == 0:
-                padrao = [df_m['cor'].iloc[i-4], df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2]]
-                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_majority(padrao)
-        return df_m, "Melhor de 3", padrao
-
-    def sevenflip():
-        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
-        for i in range(6, len(df_m)):
-            padrao = list(df_m['cor'].iloc[i-6:i+1])
-            if padrao.count('VERDE') == 7: df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'PUT'
-            elif padrao.count('VERMELHA') == 7: df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL'
-        return df_m, "Seven Flip", padrao
-
-    funcoes = [mhi1, mhi2, mhi3, r7, torres, p3x1, p23, mosqueteiros, melhor3, sevenflip] 
-
-    for func in funcoes:
-        df_sinais, nome, padrao = func()
-        v0, v1, v2, loss, total = 0, 0, 0, 0, 0
-        for i in range(len(df_sinais)-4):
-            s = df_sinais['sinal'].iloc[i]
-            if s == 'NONE': continue
-            total += 1
-            alvo = 'VERDE' if s == 'CALL' else 'VERMELHA'
-            if df_sinais['cor'].iloc[i+1] == alvo: v0 += 1
-            elif df_sinais['cor'].iloc[i+2] == alvo: v1 += 1
-            elif df_sinais['cor'].iloc[i+3] == alvo: v2 += 1
-            else: loss += 1
-        
-        if total > 0:
-            direcao = df_sinais[df_sinais['sinal'] != 'NONE']['sinal'].iloc[-1] if not df_sinais[df_sinais['sinal'] != 'NONE'].empty else "NONE"
-            resultados_par.append({
-                "par": par, "estrategia": nome,
-                "assertividade": round(((v0+v1+v2)/total)*100, 2),
-                "gales": {"v0": v0, "v1": v1, "v2": v2, "loss": loss},
-                "padrao": padrao,
-                "direcao": direcao
-            })
-    return resultados_par
+        buffer = buffer_do_par(par, timeframe, quantidade)
+        inicio_busca = time.monotonic()
+        # Só pede as velas a partir da última guardada (que pode ter fechado desde então)
+        faltam = quantidade
+        if buffer.ultimo_timestamp is not None:
+            faltam = min(quantidade, int(fonte.relogio.time() - buffer.ultimo_timestamp) // timeframe + 1)
+        with TEMPO_BUSCA.cronometrar(par=par):
+            try:
+                velas_raw = api.get_candles(par, timeframe, faltam, fonte.relogio.time())
+            except Exception as e:
+                # Cliente desconectado: a coleta reconecta a sessão e tenta o par em outra.
+                # Conectado, o erro é do par (inválido, fechado) e a sessão segue na rotação
+                if not coleta.conectado(api): raise coleta.FalhaSessao(repr(e)) from e
+                raise
+        if not velas_raw:
+            ERROS_BUSCA.incrementar(par=par, motivo="vazio"); return None
+        with travas_pares[par], TEMPO_MONTAGEM.cronometrar(par=par):
+            # Uma busca que estourou o timeout segue rodando e pode terminar depois da do
+            # ciclo seguinte (em outra sessão): chegando atrasada, é descartada
+            if montado_em.get(par, float('-inf')) > inicio_busca:
+                ERROS_BUSCA.incrementar(par=par, motivo="atrasada"); return None
+            montado_em[par] = inicio_busca
+            buffer.anexar(velas_raw)
+            arquivos_velas[par].gravar(velas_raw, fonte.relogio.time())
+            atualizar_derivados(par, buffer)
+            atualizar_estatisticas(par, buffer)
+            atualizar_proximos(par, buffer)
+        if buffer.tamanho < MINIMO_VELAS:
+            ERROS_BUSCA.incrementar(par=par, motivo="poucas_velas"); return None
+        return buffer
+    except coleta.FalhaSessao as e:
+        ERROS_BUSCA.incrementar(par=par, motivo="sessao")
+        app.logger.warning("Sessão falhou ao buscar velas de %s: %s", par, e)
+        raise
+    except Exception as e:
+        # Um par com problema não derruba o ciclo, mas fica registrado
+        ERROS_BUSCA.incrementar(par=par, motivo=type(e).__name__)
+        app.logger.warning("Falha ao buscar velas de %s: %r", par, e)
+        return None
 
 def loop_catalogador():
-    global db_resultados, api_iq, catalogador_rodando
+    global db_resultados, catalogador_rodando
     catalogador_rodando = True
+    carregar_modulos()
+    pool = processos.CatalogoEmProcessos(PROCESSOS_CATALOGO, MAX_GALE) if PROCESSOS_CATALOGO else None
+    linhas = {}  # (par, timeframe) -> {estrategia: linha}
+    fechamentos = 0
     while True:
-        if api_iq:
-            todos_dados = []
-            for par in PARES_PARA_CATALOGAR:
-                df = buscar_velas(api_iq, par, TIMEFRANE_SEGUNDOS, QUANTIDADE_VELAS)
-                if df is not None:
-                    todos_dados.extend(processar_estrategias(df, par))
-            db_resultados = {"ultima_atualizacao": datetime.now().strftime('%H:%M:%S'), "dados": todos_dados}
-        time.sleep(120)
+        fechada = agendador.aguardar_fechamento(TIMEFRANE_SEGUNDOS, ATRASO_FECHAMENTO, fonte.relogio)
+        if not sessoes_iq: continue
+        try:
+            if PERFIL_CICLO and os.path.exists(ARQUIVO_PERFIL + ".pedido"):
+                os.remove(ARQUIVO_PERFIL + ".pedido")
+                with metricas.Amostrador() as amostrador:
+                    linhas = ciclo_catalogador(fechada, fechamentos, pool, linhas)
+                with open(ARQUIVO_PERFIL, 'w') as f: f.write(amostrador.pilhas())
+            else:
+                linhas = ciclo_catalogador(fechada, fechamentos, pool, linhas)
+            fechamentos += 1
+        except Exception:
+            # Um ciclo com erro não derruba o catalogador: fica no log e na métrica, e o
+            # próximo é completo (as linhas podem ter ficado pela metade) com um pool novo
+            CICLOS.incrementar(tipo="erro")
+            app.logger.exception("Falha no ciclo do catalogador (fechamento %s)", fechada + TIMEFRANE_SEGUNDOS)
+            fechamentos = 0
+            if pool:
+                pool.encerrar()
+                pool = processos.CatalogoEmProcessos(PROCESSOS_CATALOGO, MAX_GALE)
+
+def ciclo_catalogador(fechada, fechamentos, pool, linhas):
+    carregar_modulos()
+    inicio_ciclo = time.perf_counter()
+    fechamento = fechada + TIMEFRANE_SEGUNDOS
+    # A cada CICLO_COMPLETO fechamentos recalcula tudo; nos demais, só as estratégias
+    # cujo sinal acabou de ser definido pela vela que fechou
+    estrategias = None
+    if fechamentos % CICLO_COMPLETO: estrategias = motor.disparadas(int(motor.fase_minuto([fechada])[0]))
+
+    resultados = {}  # (par, timeframe) -> linhas
+    matrizes = {}  # (timeframe, estratégias) -> {par: buffer}, avaliados juntos no fim da coleta
+    catalogados = set()
+    busca = lambda api, par: buscar_velas(api, par, TIMEFRANE_SEGUNDOS, QUANTIDADE_VELAS)
+    for par, buffer in coleta.buscar_em_paralelo(sessoes_iq, PARES_PARA_CATALOGAR, busca, WORKERS_BUSCA, TIMEOUT_BUSCA_PAR):
+        if buffer is None:
+            pares_a_recalcular.add(par); continue
+        catalogados.add(par)
+        completo = estrategias is None or par in pares_a_recalcular
+        alvos = [(TIMEFRANE_SEGUNDOS, buffer, None if completo else estrategias)]
+        # Os timeframes derivados são recalculados inteiros quando fecha uma vela deles
+        alvos += [(tf, derivado, None) for tf, derivado in buffers_derivados[par].items()
+                  if (completo or fechamento % tf == 0) and derivado.tamanho >= MINIMO_VELAS]
+        for tf, alvo, nomes in alvos:
+            if pool: resultados[(par, tf)] = pool.enviar(alvo, par, nomes)
+            else: matrizes.setdefault((tf, None if nomes is None else tuple(nomes)), {})[par] = alvo
+    # A agenda só depende das velas: sai antes do catálogo, para o painel vê-la logo após o fechamento
+    for par in PARES_PARA_CATALOGAR:
+        if par not in catalogados:
+            for tf in TIMEFRAMES: proximas_entradas.pop((par, tf), None)
+    publicar_proximos(datetime.fromtimestamp(fonte.relogio.time()).strftime('%H:%M:%S'))
+    if pool: resultados = {chave: futuro.result() for chave, futuro in resultados.items()}
+    for (tf, nomes), alvos in matrizes.items():
+        for par, linhas_par in catalogo.processar_matriz(alvos, MAX_GALE, nomes).items():
+            resultados[(par, tf)] = linhas_par
+
+    publicado = fonte.relogio.time()
+    novas = []
+    for par in PARES_PARA_CATALOGAR:
+        for tf in TIMEFRAMES:
+            chave = (par, tf)
+            if chave not in resultados: continue
+            linhas_tf = linhas.setdefault(chave, {})
+            parciais = estrategias if tf == TIMEFRANE_SEGUNDOS and par not in pares_a_recalcular else None
+            for nome in (parciais if parciais is not None else list(linhas_tf)): linhas_tf.pop(nome, None)
+            for linha in resultados[chave]:
+                # O fechamento e o atraso do ciclo ficam só no snapshot: nas linhas, mudariam
+                # todo ciclo e o /api/stream mandaria cada linha recalculada como alterada
+                linha["timeframe"] = rotulo_timeframe(tf)
+                linhas_tf[linha["estrategia"]] = linha
+                novas.append(linha)
+    pares_a_recalcular.difference_update(catalogados)
+    ordem = [e.nome for e in motor.ESTRATEGIAS]
+    todos_dados = [linhas[(par, tf)][nome] for par in PARES_PARA_CATALOGAR for tf in TIMEFRAMES
+                   if (par, tf) in linhas for nome in ordem if nome in linhas[(par, tf)]]
+    publicar_resultados({
+        "ultima_atualizacao": datetime.fromtimestamp(publicado).strftime('%H:%M:%S'),
+        "fechamento": fechamento,
+        "atraso_publicacao": round(publicado - fechamento, 3),
+        "dados": todos_dados
+    })
+    publicar_recentes(datetime.fromtimestamp(publicado).strftime('%H:%M:%S'))
+    # Gravado depois de publicar, para o disco não atrasar o painel
+    with TEMPO_HISTORICO.cronometrar():
+        try: historico_resultados.gravar([dict(linha, fechamento=fechamento) for linha in novas])
+        except Exception as e: app.logger.warning("Falha ao gravar o histórico: %s", e)
+
+    TEMPO_CICLO.observar(time.perf_counter() - inicio_ciclo)
+    CICLOS.incrementar(tipo="completo" if estrategias is None else "parcial")
+    ATRASO_PUBLICACAO.definir(round(publicado - fechamento, 3))
+    PARES_CATALOGADOS.definir(len(catalogados))
+    if "--catalogador" in sys.argv: metricas.REGISTRO.gravar(ARQUIVO_METRICAS)
+    return linhas
+
+def carregar_do_arquivo():
+    # Monta os buffers com o que já está em disco. Sem snapshot anterior (partida a frio),
+    # cataloga essas velas para o /api/dados ter dados antes do primeiro login
+    carregar_modulos()
+    frio = not db_resultados["dados"]
+    todos_dados, ultimo = [], None
+    for par in PARES_PARA_CATALOGAR:
+        buffer = buffer_do_par(par, TIMEFRANE_SEGUNDOS, QUANTIDADE_VELAS)
+        with travas_pares[par]:
+            alvos = ([(TIMEFRANE_SEGUNDOS, buffer)] + list(buffers_derivados[par].items())) if frio else []
+            for tf, alvo in alvos:
+                if alvo.tamanho < MINIMO_VELAS: continue
+                for linha in catalogo.processar_estrategias(alvo, par, MAX_GALE):
+                    linha["timeframe"] = rotulo_timeframe(tf)
+                    todos_dados.append(linha)
+                ultimo = max(ultimo or 0, buffer.ultimo_timestamp)
+            if buffer.tamanho: atualizar_estatisticas(par, buffer)
+    if todos_dados and not db_resultados["dados"]:
+        publicar_resultados({"ultima_atualizacao": datetime.fromtimestamp(ultimo).strftime('%H:%M:%S'), "dados": todos_dados})
+        publicar_recentes(datetime.fromtimestamp(ultimo).strftime('%H:%M:%S'))
+
+# Os pools de processos (spawn) reimportam o script principal como __mp_main__ em cada
+# filho: lá só as funções interessam, sem snapshots, histórico nem carga do disco
+if __name__ != "__mp_main__":
+    iniciar()
 
 @app.route('/')
 def home(): 
-    return render_template('index.html')
+    return render_template('index.html', stream=STREAM_PAINEL)
 
 @app.route('/api/login', methods=['POST'])
 def login():
-    global api_iq, catalogador_rodando
+    global sessoes_iq, catalogador_rodando
     d = request.json
-    api_iq = conectar_api(d.get('email'), d.get('password'))
-    if api_iq:
+    if CATALOGADOR_EXTERNO:
+        # Só confere as credenciais; a sessão de catalogação é a do processo catalogador
+        api = conectar_api(d.get('email'), d.get('password'))
+        if api:
+            try: api.api.close()
+            except Exception: pass
+        return jsonify({"status": "success" if api else "error"})
+    novas = abrir_sessoes(d.get('email'), d.get('password'))
+    if novas:
+        if sessoes_iq: sessoes_iq.encerrar()
+        sessoes_iq = novas
         if not catalogador_rodando: 
             threading.Thread(target=loop_catalogador, daemon=True).start()
         return jsonify({"status": "success"})
@@ -201,9 +406,192 @@ def login():
 
 @app.route('/api/dados')
 def get_dados(): 
-    return jsonify(db_resultados)
+    # JSON serializado uma vez por versão; 304 quando o If-None-Match bate com o ETag
+    atual = snapshot_atual()
+    a = request.args
+    if any(p in a for p in FILTROS_DADOS):
+        # Filtrado e ordenado pela assertividade no nível `gale`; `limite` é o top-N (ou o tamanho da página)
+        try:
+            posicoes = atual.indice.filtrar(a.get('par'), a.get('estrategia'), a.get('timeframe'),
+                                            a.get('minimo', type=float), a.get('gale', type=int))
+        except ValueError as e:
+            return jsonify({"status": "error", "mensagem": str(e)}), 400
+        limite, pagina = a.get('limite', type=int), max(a.get('pagina', 1, type=int), 1)
+        pagina_atual = posicoes[(pagina - 1) * limite:pagina * limite] if limite and limite > 0 else posicoes
+        resposta = Response(atual.indice.corpo(pagina_atual, total=len(posicoes), pagina=pagina), mimetype='application/json')
+        resposta.set_etag(f"{atual.etag}-{zlib.crc32(request.query_string):08x}")
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta.make_conditional(request)
+    resposta = Response(atual.corpo, mimetype='application/json')
+    resposta.set_etag(atual.etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
+@app.route('/api/stream')
+def stream():
+    # Server-sent events: o snapshot completo ao conectar e depois só as linhas que mudaram.
+    # Cada conexão ocupa um worker/thread; o painel só usa com STREAM_PAINEL=1.
+    def eventos():
+        atual = snapshot_atual()
+        yield atual.evento_completo
+        ocioso = 0
+        while True:
+            time.sleep(INTERVALO_STREAM)
+            novo = snapshot_atual()
+            if novo.versao == atual.versao:
+                ocioso += INTERVALO_STREAM
+                if ocioso >= 15: ocioso = 0; yield b": ping\n\n"
+                continue
+            ocioso = 0
+            yield novo.evento_delta if novo.base == atual.versao else novo.evento_completo
+            atual = novo
+    return Response(eventos(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/recentes')
+def recentes():
+    # Ranking das estratégias pela assertividade dos últimos `janela` sinais resolvidos
+    atual = leitor_recentes.ler() if CATALOGADOR_EXTERNO else publicador_recentes.atual
+    janela = request.args.get('janela', str(JANELAS_RECENTES[0]))
+    if janela not in map(str, JANELAS_RECENTES):
+        return jsonify({"status": "error", "mensagem": f"janela deve ser uma de {list(JANELAS_RECENTES)}"}), 400
+    timeframe = request.args.get('timeframe')
+    minimo = request.args.get('minimo', 1, type=int)
+    limite = request.args.get('limite', type=int)
+    dados = [d for d in atual.conteudo.get("dados", [])
+             if (timeframe is None or d["timeframe"] == timeframe) and d["janelas"][janela]["sinais"] >= minimo]
+    dados.sort(key=lambda d: d["janelas"][janela]["assertividade"], reverse=True)
+    if limite and limite > 0: dados = dados[:limite]
+    return jsonify({"ultima_atualizacao": atual.conteudo.get("ultima_atualizacao"), "janela": int(janela), "dados": dados})
+
+@app.route('/api/proximos')
+def consultar_proximos():
+    # Próxima entrada de cada estratégia, da mais perto para a mais longe. `direcao` é null
+    # enquanto o sinal depende de velas abertas (ver `possiveis`); entradas que já abriram
+    # saem até o próximo fechamento. `faltam` é contado na hora do pedido
+    atual = leitor_proximos.ler() if CATALOGADOR_EXTERNO else publicador_proximos.atual
+    a = request.args
+    if CATALOGADOR_EXTERNO and "relogio" in atual.conteudo:
+        agora = atual.conteudo["relogio"] + (time.time() - atual.conteudo["real"]) * getattr(fonte.relogio, "velocidade", 1)
+    else:
+        agora = fonte.relogio.time()
+    filtros = [(campo, a[campo]) for campo in ('par', 'estrategia', 'timeframe', 'direcao') if campo in a]
+    dados = [dict(d, faltam=round(d["entrada"] - agora, 1)) for d in atual.conteudo.get("dados", [])
+             if d["entrada"] > agora and all(d[campo] == valor for campo, valor in filtros)]
+    limite = a.get('limite', type=int)
+    if limite and limite > 0: dados = dados[:limite]
+    return jsonify({"ultima_atualizacao": atual.conteudo.get("ultima_atualizacao"), "dados": dados})
+
+def instante(valor):
+    # Timestamp em segundos ou data/hora ISO (2024-05-01, 2024-05-01T13:00)
+    if valor is None: return None
+    return int(valor) if valor.lstrip('-').isdigit() else int(datetime.fromisoformat(valor).timestamp())
+
+@app.route('/api/historico')
+def consultar_historico():
+    # Linhas dos ciclos em [inicio, fim) ou, com agrupar=total|hora|dia|semana, as estatísticas por período
+    a = request.args
+    try:
+        filtros = dict(par=a.get('par'), estrategia=a.get('estrategia'), timeframe=a.get('timeframe'),
+                       inicio=instante(a.get('inicio')), fim=instante(a.get('fim')))
+        if a.get('agrupar'):
+            dados = historico_resultados.agregar(agrupar=a['agrupar'], **filtros)
+        else:
+            # Entre 1 e LIMITE_HISTORICO: no SQLite um LIMIT negativo é sem limite
+            limite = min(max(a.get('limite', 1000, type=int), 1), LIMITE_HISTORICO)
+            dados = historico_resultados.consultar(limite=limite, **filtros)
+    except ValueError as e:
+        return jsonify({"status": "error", "mensagem": str(e)}), 400
+    return jsonify({"dados": dados})
+
+def gravar_varredura(job):
+    caminho = os.path.join(DIR_VARREDURAS, f"{job['id']}.json")
+    with open(caminho + ".tmp", 'w') as f: json.dump(job, f)
+    os.replace(caminho + ".tmp", caminho)
+
+def executar_varredura(job, pares, timeframe, quantidade, parametros):
+    global varredura_rodando
+    try:
+        series = varredura.carregar_series(DIR_CACHE_VELAS, pares, timeframe, quantidade)
+        if not series: raise ValueError("nenhuma vela em cache para esses pares")
+        job["pares"] = list(series)
+        job["resultado"] = varredura.varrer(series, workers=PROCESSOS_VARREDURA, **parametros)
+        job["status"] = "concluida"
+    except Exception as e:
+        app.logger.warning("Falha na varredura %s: %s", job["id"], e)
+        job["status"], job["mensagem"] = "erro", str(e)
+    job["fim"] = time.time()
+    gravar_varredura(job)
+    varredura_rodando = None
+
+@app.route('/api/varredura', methods=['POST'])
+def iniciar_varredura():
+    # Grade de regra x janela x fase x gale (ver varredura.parametros); o resultado sai em GET /api/varredura/<id>
+    global varredura_rodando
+    d = request.json or {}
+    carregar_modulos()
+    try:
+        parametros = varredura.parametros(d)
+        timeframe = int(d.get('timeframe', TIMEFRANE_SEGUNDOS))
+        quantidade = int(d['velas']) if d.get('velas') is not None else None
+        if timeframe <= 0 or timeframe % 60: raise ValueError("timeframe deve ser múltiplo de 60")
+        # O par vira parte do caminho do arquivo de velas: só os catalogados ou já em cache
+        pares = d.get('pares') or PARES_PARA_CATALOGAR
+        if not isinstance(pares, list): raise ValueError("pares deve ser uma lista")
+        conhecidos = set(PARES_PARA_CATALOGAR) | set(varredura.pares_em_cache(DIR_CACHE_VELAS))
+        desconhecidos = [p for p in pares if p not in conhecidos]
+        if desconhecidos: raise ValueError(f"pares desconhecidos: {', '.join(map(str, desconhecidos))}")
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "mensagem": str(e)}), 400
+    with trava_varredura:
+        if varredura_rodando:
+            return jsonify({"status": "error", "mensagem": "já existe uma varredura em andamento", "id": varredura_rodando}), 409
+        os.makedirs(DIR_VARREDURAS, exist_ok=True)
+        antigos = sorted(glob.glob(os.path.join(DIR_VARREDURAS, "*.json")), key=os.path.getmtime)
+        for caminho in antigos[:max(len(antigos) - VARREDURAS_GUARDADAS + 1, 0)]: os.remove(caminho)
+        job = {"id": uuid.uuid4().hex[:12], "status": "rodando", "inicio": time.time(), "fim": None,
+               "parametros": dict(d, timeframe=timeframe)}
+        gravar_varredura(job)
+        varredura_rodando = job["id"]
+    threading.Thread(target=executar_varredura, args=(job, pares, timeframe, quantidade, parametros), daemon=True).start()
+    return jsonify({"status": "success", "id": job["id"]}), 202
+
+@app.route('/api/varredura/<id_job>')
+def consultar_varredura(id_job):
+    try:
+        if not id_job.isalnum(): raise OSError
+        with open(os.path.join(DIR_VARREDURAS, f"{id_job}.json"), 'rb') as f:
+            return Response(f.read(), mimetype='application/json')
+    except OSError:
+        return jsonify({"status": "error", "mensagem": "varredura não encontrada"}), 404
+
+@app.route('/api/metrics')
+def metrics():
+    # Formato texto do Prometheus; no modo externo, as do processo catalogador
+    texto = metricas.REGISTRO.texto()
+    if CATALOGADOR_EXTERNO:
+        try:
+            with open(ARQUIVO_METRICAS) as f: texto = f.read()
+        except OSError: texto = ""
+    return Response(texto, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/perfil', methods=['GET', 'POST'])
+def perfil():
+    if not PERFIL_CICLO: return jsonify({"status": "error", "mensagem": "PERFIL_CICLO desativado"}), 404
+    if request.method == 'POST':
+        # O catalogador (thread ou processo externo) vê o pedido no próximo fechamento
+        open(ARQUIVO_PERFIL + ".pedido", 'w').close()
+        return jsonify({"status": "success"})
+    try:
+        with open(ARQUIVO_PERFIL) as f: return Response(f.read(), mimetype='text/plain')
+    except OSError:
+        return jsonify({"status": "error", "mensagem": "nenhum perfil capturado"}), 404
 
-if __name__ == "__main__":
+if __name__ == "__main__" and "--catalogador" in sys.argv:
+    # Processo produtor único: cataloga e publica os snapshots lidos pelos workers
+    sessoes_iq = abrir_sessoes(os.environ.get("IQ_EMAIL"), os.environ.get("IQ_SENHA"))
+    if not sessoes_iq: sys.exit("Falha ao conectar na IQ Option (confira IQ_EMAIL/IQ_SENHA).")
+    loop_catalogador()
+elif __name__ == "__main__":
     # Na AWS EC2, porta padrão é 5000, host 0.0.0.0 para acesso externo
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,385 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import catalogo
+import motor
+import proximos
+import replay
+import snapshot
+import velas
+
+# --- CONFIGURAÇÃO ---
+TIMEFRAME = 60
+MAX_GALE = 2
+# "velas x pares". A busca de 1M velas (lista de dicts, como o get_candles devolve)
+# leva ~20 s e ~500 MiB por par; 1000000x16 fica para quando for pedido em --casos
+CASOS_PADRAO = "240x16,240x300,10000x16,10000x300,1000000x1"
+ARQUIVO_BASE = "benchmark_base.json"
+
+# --- MEDIÇÃO ---
+class Medidor:
+    """Acumula o tempo (somado entre os pares) e o pico de memória (maior entre os pares)
+    de cada etapa do ciclo. A memória é a alocada além do que já existia ao entrar na etapa."""
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        tracemalloc.reset_peak()
+        antes = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            tempo = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1] - antes
+            atual = self.etapas.setdefault(nome, {"tempo": 0.0, "memoria": 0})
+            atual["tempo"] += tempo
+            atual["memoria"] = max(atual["memoria"], pico)
+
+def rodar_caso(quantidade, n_pares, semente=0):
+    """Um ciclo completo do catalogador sobre velas sintéticas: busca, buffer (cores, fases
+    e sinais), cada estratégia isolada, pontuação, JSON e o fechamento seguinte (incremental).
+    "pontuacao (matriz)" é a mesma pontuação com todos os pares numa matriz só."""
+    origem = replay.FonteReplay(semente=semente)
+    pares = [f"PAR{i:03d}" for i in range(n_pares)]
+    fim = (int(time.time()) // TIMEFRAME) * TIMEFRAME
+    medidor, linhas, buffers = Medidor(), [], {}
+    for par in pares:
+        with medidor.etapa("busca"):
+            velas_raw = origem.get_candles(par, TIMEFRAME, quantidade, fim)
+        with medidor.etapa("buffer"):
+            buffer = velas.BufferVelas(quantidade)
+            buffer.anexar(velas_raw)
+        del velas_raw
+        buffers[par] = buffer
+        cores, fases, idx = buffer.cores(), buffer.fases(), np.arange(buffer.tamanho)
+        for estrategia in motor.ESTRATEGIAS:
+            with medidor.etapa(f"estrategia {estrategia.nome}"):
+                estrategia.avaliador(cores, fases, idx)
+        with medidor.etapa("pontuacao"):
+            linhas.extend(catalogo.processar_estrategias(buffer, par, MAX_GALE))
+        with medidor.etapa("fechamento seguinte"):
+            buffer.anexar(origem.get_candles(par, TIMEFRAME, 2, fim + TIMEFRAME))
+            catalogo.processar_estrategias(buffer, par, MAX_GALE, motor.disparadas(int(motor.fase_minuto([fim])[0])))
+    with medidor.etapa("pontuacao (matriz)"):
+        catalogo.processar_matriz(buffers, MAX_GALE)
+    with medidor.etapa("json"):
+        snapshot.Snapshot({"ultima_atualizacao": "00:00:00", "dados": linhas, "versao": 1})
+    return medidor.etapas
+
+# --- REFERÊNCIA (LOOPS ORIGINAIS) ---
+# O processamento do app.py original copiado como estava (pandas, vela a vela com .iloc,
+# gale 2): a conferência não pode depender do registro de estratégias que ela confere.
+def get_minority(cores):
+    v, r = cores.count('VERDE'), cores.count('VERMELHA')
+    return 'CALL' if v < r else 'PUT' if r < v else 'NONE'
+
+def get_majority(cores):
+    v, r = cores.count('VERDE'), cores.count('VERMELHA')
+    return 'CALL' if v > r else 'PUT' if r > v else 'NONE'
+
+def processar_estrategias_original(df, par):
+    resultados_par = []
+    
+    def mhi1():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]); 
+            if dt.minute % 5 == 4:
+                padrao = [df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1], df_m['cor'].iloc[i]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
+        return df_m, "MHI 1", padrao
+
+    def mhi2():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 0:
+                padrao = [df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
+        return df_m, "MHI 2", padrao
+
+    def mhi3():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 1:
+                padrao = [df_m['cor'].iloc[i-4], df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
+        return df_m, "MHI 3", padrao
+
+    def r7():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(7, len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 0:
+                padrao = [df_m['cor'].iloc[i-7], df_m['cor'].iloc[i-6]]
+                if padrao[0] == padrao[1] and padrao[0] != 'DOJI':
+                    df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL' if padrao[0] == 'VERDE' else 'PUT'
+        return df_m, "R7", padrao
+
+    def torres():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(3, len(df_m)):
+            padrao = list(df_m['cor'].iloc[i-3:i+1])
+            sinal = 'NONE'
+            if padrao[0] == 'VERMELHA' and all(x == 'VERDE' for x in padrao[1:]): sinal = 'PUT'
+            elif padrao[0] == 'VERDE' and all(x == 'VERMELHA' for x in padrao[1:]): sinal = 'CALL'
+            df_m.iloc[i, df_m.columns.get_loc('sinal')] = sinal
+        return df_m, "Torres Gemeas", padrao
+
+    def p3x1():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 3:
+                padrao = [df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_minority(padrao)
+        return df_m, "Padrao 3x1", padrao
+
+    def p23():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 0:
+                padrao = [df_m['cor'].iloc[i]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL' if padrao[0] == 'VERDE' else 'PUT'
+        return df_m, "Padrao 23", padrao
+
+    def mosqueteiros():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 2:
+                padrao = [df_m['cor'].iloc[i-2], df_m['cor'].iloc[i-1], df_m['cor'].iloc[i]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_majority(padrao)
+        return df_m, "Tres Mosqueteiros", padrao
+
+    def melhor3():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(5, len(df_m)):
+            dt = datetime.fromtimestamp(df_m.index[i]);
+            if dt.minute % 5 == 0:
+                padrao = [df_m['cor'].iloc[i-4], df_m['cor'].iloc[i-3], df_m['cor'].iloc[i-2]]
+                df_m.iloc[i, df_m.columns.get_loc('sinal')] = get_majority(padrao)
+        return df_m, "Melhor de 3", padrao
+
+    def sevenflip():
+        df_m = df.copy(); df_m['sinal'] = 'NONE'; padrao = []
+        for i in range(6, len(df_m)):
+            padrao = list(df_m['cor'].iloc[i-6:i+1])
+            if padrao.count('VERDE') == 7: df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'PUT'
+            elif padrao.count('VERMELHA') == 7: df_m.iloc[i, df_m.columns.get_loc('sinal')] = 'CALL'
+        return df_m, "Seven Flip", padrao
+
+    funcoes = [mhi1, mhi2, mhi3, r7, torres, p3x1, p23, mosqueteiros, melhor3, sevenflip] 
+
+    for func in funcoes:
+        df_sinais, nome, padrao = func()
+        v0, v1, v2, loss, total = 0, 0, 0, 0, 0
+        for i in range(len(df_sinais)-4):
+            s = df_sinais['sinal'].iloc[i]
+            if s == 'NONE': continue
+            total += 1
+            alvo = 'VERDE' if s == 'CALL' else 'VERMELHA'
+            if df_sinais['cor'].iloc[i+1] == alvo: v0 += 1
+            elif df_sinais['cor'].iloc[i+2] == alvo: v1 += 1
+            elif df_sinais['cor'].iloc[i+3] == alvo: v2 += 1
+            else: loss += 1
+        
+        if total > 0:
+            direcao = df_sinais[df_sinais['sinal'] != 'NONE']['sinal'].iloc[-1] if not df_sinais[df_sinais['sinal'] != 'NONE'].empty else "NONE"
+            resultados_par.append({
+                "par": par, "estrategia": nome,
+                "assertividade": round(((v0+v1+v2)/total)*100, 2),
+                "gales": {"v0": v0, "v1": v1, "v2": v2, "loss": loss},
+                "padrao": padrao,
+                "direcao": direcao
+            })
+    return resultados_par
+
+def processar_referencia(colunas, par):
+    """O DataFrame do buscar_velas original (sem a busca) montado das `colunas` do buffer
+    e passado ao processar_estrategias_original."""
+    df = pd.DataFrame({'from': colunas['from'], 'open': colunas['open'], 'close': colunas['close']})
+    df.rename(columns={'open':'open', 'close':'close', 'from':'timestamp'}, inplace=True)
+    df['cor'] = 'DOJI'
+    df.loc[df['close'] > df['open'], 'cor'] = 'VERDE'
+    df.loc[df['close'] < df['open'], 'cor'] = 'VERMELHA'
+    df.set_index('timestamp', inplace=True)
+    return processar_estrategias_original(df, par)
+
+def _sem_extras(linhas):
+    return [{k: v for k, v in linha.items() if k != "assertividade_gales"} for linha in linhas]
+
+def conferir_equivalencia(quantidade, n_pares, semente=0):
+    """Compara o catálogo otimizado com a referência numa carga inteira e num buffer
+    alimentado aos poucos (com lacunas e dando a volta no array circular).
+    Retorna a lista de divergências (vazia se tudo bate)."""
+    gerador = np.random.default_rng(semente)
+    divergencias, buffers = [], {"carga inteira": {}, "incremental": {}}
+    for par in [f"PAR{i:03d}" for i in range(n_pares)]:
+        # Minutos com lacunas ocasionais, como em pares que fecham ou perdem velas
+        passos = np.where(gerador.random(3 * quantidade) < 0.02, gerador.integers(2, 30, 3 * quantidade), 1)
+        ts = 1_650_000_000 // TIMEFRAME * TIMEFRAME + TIMEFRAME * np.cumsum(passos)
+        colunas = replay.velas_sinteticas(par, ts, semente)
+        registros = np.zeros(len(ts), dtype=velas.ArquivoVelas.DTYPE)
+        for campo in registros.dtype.names:
+            registros[campo] = colunas[campo]
+
+        cheio = velas.BufferVelas(quantidade)
+        cheio.anexar(registros[-quantidade:])
+        casos = [("carga inteira", cheio)]
+        incremental, fim = velas.BufferVelas(quantidade), 0
+        while fim < len(registros):
+            fim = min(fim + int(gerador.integers(1, max(quantidade // 4, 2))), len(registros))
+            incremental.anexar(registros[max(fim - quantidade, 0):fim])
+        casos.append(("incremental", incremental))
+
+        for rotulo, buffer in casos:
+            buffers[rotulo][par] = buffer
+            obtido = _sem_extras(catalogo.processar_estrategias(buffer, par, MAX_GALE))
+            esperado = processar_referencia(buffer.colunas(), par)
+            if obtido != esperado:
+                divergencias.append(f"{par} ({rotulo}, {quantidade} velas)")
+
+    # A matriz de pares tem de dar, linha a linha, o mesmo que cada par sozinho
+    for rotulo, por_par in buffers.items():
+        matriz = catalogo.processar_matriz(por_par, MAX_GALE)
+        for par, buffer in por_par.items():
+            if matriz[par] != catalogo.processar_estrategias(buffer, par, MAX_GALE):
+                divergencias.append(f"{par} ({rotulo}, matriz, {quantidade} velas)")
+    return divergencias
+
+def conferir_proximos(quantidade, n_pares, semente=0, instantes=100):
+    """Confere o proximos.proximas em `instantes` sorteados por par, em M1 e M5, contra o
+    sinal que o buffer dá quando as velas chegam: o sinal tem de estar nos `possiveis`, a
+    `direcao` (quando definida) tem de ser ele e os gatilhos pulados não podiam dar sinal.
+    Retorna (divergências, entradas conferidas)."""
+    gerador = np.random.default_rng(semente)
+    divergencias, conferidas = [], 0
+    for tf in (60, 300):
+        for par in [f"PAR{i:03d}" for i in range(n_pares)]:
+            # Sem lacunas, para a posição de cada vela sair do horário; a folga no fim cobre
+            # os gatilhos adiante do último instante
+            t0 = 1_650_000_000 // tf * tf
+            todas = replay.velas_sinteticas(par, t0 + tf * np.arange(3 * quantidade + 100), semente)
+            cache = {}
+
+            def buffer_ate(i):
+                # Buffer como o catalogador o teria com a vela i fechada
+                buffer = velas.BufferVelas(quantidade, tf)
+                buffer.anexar({k: v[:i + 1] for k, v in todas.items()})
+                return buffer
+
+            def sinal_em(i, nome):
+                if i not in cache:
+                    buffer = buffer_ate(i)
+                    cache[i] = {e.nome: int(buffer.sinais(e.nome)[-1]) for e in motor.ESTRATEGIAS}
+                return cache[i][nome]
+
+            for passo in map(int, gerador.integers(max(quantidade, motor.ALCANCE + 1), 3 * quantidade, instantes)):
+                agora = t0 + passo * tf + int(gerador.integers(0, tf))  # vela `passo` em formação
+                linhas = {l["estrategia"]: l for l in proximos.proximas(buffer_ate(passo - 1), agora)}
+                for e in motor.ESTRATEGIAS:
+                    l, rotulo = linhas.get(e.nome), f"{par} M{tf // 60} {e.nome} em {agora}"
+                    if l is None:
+                        divergencias.append(f"{rotulo} (sem linha)"); continue
+                    gatilho = (l["gatilho"] - t0) // tf
+                    if l["entrada"] <= agora or gatilho < passo or gatilho >= len(todas["from"]):
+                        divergencias.append(f"{rotulo} (gatilho {l['gatilho']})"); continue
+                    sinal = motor.ROTULOS_SINAL[sinal_em(gatilho, e.nome)]
+                    if sinal not in l["possiveis"] or l["direcao"] not in (None, sinal):
+                        divergencias.append(f"{rotulo} (saiu {sinal})")
+                    # Gatilhos pulados entre agora e este não podiam dar sinal
+                    pulados = [h for h in range(passo, gatilho) if e.fase is None or (t0 // tf + h) % 5 == e.fase]
+                    if any(sinal_em(h, e.nome) != motor.NONE for h in pulados):
+                        divergencias.append(f"{rotulo} (gatilho pulado)")
+                    conferidas += 1
+    return divergencias, conferidas
+
+# --- BASE E REGRESSÕES ---
+def regressoes(resultados, base, tolerancia, folga):
+    """Etapas que ficaram mais de `tolerancia` (fração) acima da base em tempo ou memória.
+    `folga` (segundos) evita acusar ruído em etapas de poucos milissegundos."""
+    encontradas = []
+    for caso, etapas in resultados.items():
+        for nome, medida in etapas.items():
+            anterior = base.get(caso, {}).get(nome)
+            if anterior is None: continue
+            if medida["tempo"] > anterior["tempo"] * (1 + tolerancia) + folga:
+                encontradas.append(f"{caso} / {nome}: tempo {anterior['tempo']:.4f}s -> {medida['tempo']:.4f}s")
+            if medida["memoria"] > anterior["memoria"] * (1 + tolerancia) + 1024 * 1024:
+                encontradas.append(f"{caso} / {nome}: memória {anterior['memoria']} -> {medida['memoria']} bytes")
+    return encontradas
+
+def _imprimir(caso, etapas, base):
+    print(f"\n== {caso} ==")
+    print(f"{'etapa':<32}{'tempo (s)':>12}{'base (s)':>12}{'pico (MiB)':>12}")
+    for nome, medida in etapas.items():
+        anterior = base.get(caso, {}).get(nome)
+        tempo_base = f"{anterior['tempo']:.4f}" if anterior else "-"
+        print(f"{nome:<32}{medida['tempo']:>12.4f}{tempo_base:>12}{medida['memoria'] / 2 ** 20:>12.2f}")
+
+# --- EXECUÇÃO PRINCIPAL ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do ciclo do catalogador com velas sintéticas.")
+    parser.add_argument("--casos", default=CASOS_PADRAO, help="lista 'velas x pares', ex.: 240x16,10000x300")
+    parser.add_argument("--repeticoes", type=int, default=1, help="fica com o menor tempo de cada etapa")
+    parser.add_argument("--base", default=ARQUIVO_BASE, help="arquivo JSON com os tempos de referência")
+    parser.add_argument("--gravar-base", action="store_true", help="grava os resultados como nova base")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="regressão aceita (fração da base)")
+    parser.add_argument("--folga", type=float, default=0.005, help="segundos ignorados em cada etapa")
+    parser.add_argument("--conferir", default="240x4,2000x2", help="casos da conferência com os loops originais ('' desliga)")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    falhou = False
+    for caso in filter(None, args.conferir.split(",")):
+        quantidade, n_pares = map(int, caso.split("x"))
+        divergencias = conferir_equivalencia(quantidade, n_pares, args.semente)
+        print(f"Conferência {caso}: {'OK' if not divergencias else 'DIVERGE em ' + ', '.join(divergencias)}")
+        falhou |= bool(divergencias)
+        divergencias, conferidas = conferir_proximos(quantidade, n_pares, args.semente)
+        print(f"Conferência dos próximos {caso}: {'OK' if not divergencias else 'DIVERGE em ' + ', '.join(divergencias[:20])} ({conferidas} entradas)")
+        falhou |= bool(divergencias)
+
+    base = {}
+    if os.path.exists(args.base):
+        with open(args.base) as f:
+            base = json.load(f)
+
+    resultados = {}
+    tracemalloc.start()
+    for caso in filter(None, args.casos.split(",")):
+        quantidade, n_pares = map(int, caso.split("x"))
+        for _ in range(args.repeticoes):
+            etapas = rodar_caso(quantidade, n_pares, args.semente)
+            melhor = resultados.setdefault(caso, etapas)
+            for nome, medida in etapas.items():
+                melhor[nome]["tempo"] = min(melhor[nome]["tempo"], medida["tempo"])
+                melhor[nome]["memoria"] = max(melhor[nome]["memoria"], medida["memoria"])
+        _imprimir(caso, resultados[caso], base)
+    tracemalloc.stop()
+
+    if args.gravar_base:
+        with open(args.base, "w") as f:
+            json.dump(dict(base, **resultados), f, indent=2)
+        print(f"\nBase gravada em {args.base}.")
+    else:
+        encontradas = regressoes(resultados, base, args.tolerancia, args.folga)
+        for r in encontradas: print(f"REGRESSÃO: {r}")
+        falhou |= bool(encontradas)
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import time
+from itertools import accumulate
+import numpy as np
+import metricas
+import motor
+
+_TEMPO_PONTUACAO = metricas.REGISTRO.histograma(
+    "catalogador_pontuacao_segundos", "Tempo de pontuação (gales) de cada estratégia por par.")
+_TEMPO_MATRIZ = metricas.REGISTRO.histograma(
+    "catalogador_matriz_segundos", "Tempo do processar_matriz (todas as estratégias e pares de uma vez).")
+
+# --- PROCESSAMENTO DAS ESTRATÉGIAS ---
+def processar_estrategias(velas, par, max_gale=2, estrategias=None):
+    """Pontua as estratégias de um par (todas, ou só as `estrategias`) e monta as linhas
+    do /api/dados. `velas` é qualquer objeto com cores(), fases() e sinais(nome), como o BufferVelas."""
+    resultados_par = []
+    cores = velas.cores()
+    padroes = motor.padroes(cores, velas.fases(), estrategias)
+
+    for estrategia in motor.ESTRATEGIAS:
+        nome = estrategia.nome
+        if estrategias is not None and nome not in estrategias: continue
+        inicio = time.perf_counter()
+        sinais = velas.sinais(nome)
+        # O painel sempre deixou uma vela a mais de folga no fim (len - 4 com gale 2)
+        vitorias, total = motor.pontuar(sinais, cores, max_gale, margem=max_gale + 2)
+        _TEMPO_PONTUACAO.observar(time.perf_counter() - inicio, estrategia=nome)
+
+        if total > 0:
+            disparados = sinais[sinais != motor.NONE]
+            direcao = motor.ROTULOS_SINAL[int(disparados[-1])] if len(disparados) else "NONE"
+            gales = {f"v{g}": int(v) for g, v in enumerate(vitorias)}
+            gales["loss"] = int(total - vitorias.sum())
+            resultados_par.append({
+                "par": par, "estrategia": nome,
+                "assertividade": round((int(vitorias.sum())/total)*100, 2),
+                "assertividade_gales": motor.assertividade_por_gale(vitorias, total),
+                "gales": gales,
+                "padrao": [motor.ROTULOS_COR[c] for c in padroes[nome]],
+                "direcao": direcao
+            })
+    return resultados_par
+
+# --- MATRIZ DE PARES ---
+def processar_matriz(velas_por_par, max_gale=2, estrategias=None):
+    """processar_estrategias de todos os pares de uma vez: cores, fases e sinais empilhados
+    numa matriz (pares x velas), uma pontuação para todas as estratégias e pares e um
+    padrão por estratégia. Retorna {par: linhas}, iguais às de cada par sozinho."""
+    inicio = time.perf_counter()
+    resultado = {par: [] for par in velas_por_par}
+    pares = [par for par, v in velas_por_par.items() if v.tamanho]
+    if not pares or (estrategias is not None and not estrategias): return resultado
+    cores, tamanhos = motor.empilhar([velas_por_par[p].cores() for p in pares])
+    fases, _ = motor.empilhar([velas_por_par[p].fases() for p in pares])
+    nomes = [e.nome for e in motor.ESTRATEGIAS if estrategias is None or e.nome in estrategias]
+    sinais = np.stack([motor.empilhar([velas_por_par[p].sinais(nome) for p in pares])[0] for nome in nomes])
+    vitorias, totais = motor.pontuar_matriz(sinais, cores, max_gale, margem=max_gale + 2)
+    direcoes = motor.direcoes_matriz(sinais)
+    padroes = motor.padroes_matriz(cores, fases, tamanhos, nomes)
+
+    # Em ints do Python: montar milhares de linhas com escalares do numpy custaria mais que a matriz
+    vitorias, totais, direcoes = vitorias.tolist(), totais.tolist(), direcoes.tolist()
+    for i, par in enumerate(pares):
+        for j, nome in enumerate(nomes):
+            total = totais[j][i]
+            if total == 0: continue
+            v = vitorias[j][i]
+            acumuladas = list(accumulate(v))  # mesma conta do motor.assertividade_por_gale
+            gales = {f"v{g}": x for g, x in enumerate(v)}
+            gales["loss"] = total - acumuladas[-1]
+            resultado[par].append({
+                "par": par, "estrategia": nome,
+                "assertividade": round((acumuladas[-1]/total)*100, 2),
+                "assertividade_gales": [round(a / total * 100, 2) for a in acumuladas],
+                "gales": gales,
+                "padrao": [motor.ROTULOS_COR[c] for c in padroes[nome][i]],
+                "direcao": motor.ROTULOS_SINAL[direcoes[j][i]]
+            })
+    _TEMPO_MATRIZ.observar(time.perf_counter() - inicio)
+    return resultado
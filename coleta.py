@@ -0,0 +1,92 @@
+import queue
+import time
+import threading
+from contextlib import contextmanager
+import metricas
+
+_TIMEOUTS = metricas.REGISTRO.contador("coleta_timeouts_total", "Buscas descartadas por passarem do timeout.")
+_FALHAS_SESSAO = metricas.REGISTRO.contador(
+    "coleta_falhas_sessao_total", "Buscas em que o cliente falhou, por desfecho (retentada em outra sessão ou perdida).")
+
+class FalhaSessao(Exception):
+    """O cliente falhou na busca (websocket caído, conexão fechada): a sessão vai para
+    reconexão e o par é tentado de novo em outra."""
+
+def conectado(api):
+    """check_connect do stable_api: o websocket ainda está aberto (sem ele, conta como aberto)."""
+    verificar = getattr(api, "check_connect", None)
+    try:
+        return bool(verificar()) if verificar else True
+    except Exception:
+        return False
+
+# --- TRAVA POR CLIENTE ---
+# O get_candles do stable_api guarda a resposta num único campo do cliente
+# (api.candles.candles_data), então duas chamadas simultâneas no mesmo IQ_Option
+# podem trocar as velas de um par pelas de outro. Cada cliente atende uma por vez.
+_travas = {}
+_travas_lock = threading.Lock()
+
+def trava_do_cliente(api):
+    with _travas_lock:
+        return _travas.setdefault(id(api), threading.Lock())
+
+@contextmanager
+def _emprestar(origem, timeout):
+    # Um pool de sessões (sessoes.PoolSessoes) empresta um cliente livre; um cliente solto
+    # é usado sob a trava dele
+    if hasattr(origem, "emprestar"):
+        with origem.emprestar(timeout) as api: yield api
+    else:
+        with trava_do_cliente(origem): yield origem
+
+# --- BUSCA CONCORRENTE ---
+def buscar_em_paralelo(origem, pares, buscar, workers=4, timeout=30, tentativas=3):
+    """Executa buscar(api, par) para cada par com no máximo `workers` buscas em andamento.
+    `origem` é um cliente ou um pool de sessões. Gera (par, resultado) na ordem em que os
+    pares chegam, para o processamento começar sem esperar os demais. Um FalhaSessao
+    tenta o par de novo (até `tentativas` vezes) em outra sessão. Erros e buscas que passam
+    de `timeout` segundos geram (par, None); a sessão da busca travada é descartada."""
+    inicios, clientes = {}, {}
+
+    def tarefa(par):
+        for tentativa in range(tentativas):
+            with _emprestar(origem, timeout) as api:
+                inicios[par], clientes[par] = time.monotonic(), api
+                try:
+                    return buscar(api, par)
+                except FalhaSessao:
+                    if hasattr(origem, "reportar_falha"): origem.reportar_falha(api)
+                    ultima = tentativa == tentativas - 1
+                    _FALHAS_SESSAO.incrementar(par=par, desfecho="perdida" if ultima else "retentada")
+                    if ultima: raise
+
+    def rodar(par):
+        try: prontos.put((par, tarefa(par)))
+        except Exception: prontos.put((par, None))
+
+    # Threads daemon em vez de um ThreadPoolExecutor: uma busca travada não pode ser
+    # interrompida, e os workers do executor seguram a saída do processo até ela voltar
+    prontos, fila, pendentes = queue.Queue(), list(pares), set()
+    while fila or pendentes:
+        while fila and len(pendentes) < workers:
+            par = fila.pop(0); pendentes.add(par)
+            threading.Thread(target=rodar, args=(par,), daemon=True, name=f"coleta-{par}").start()
+        try:
+            par, resultado = prontos.get(timeout=min(timeout, 0.5))
+            # Resultado de busca que já estourou o timeout é descartado
+            if par in pendentes:
+                pendentes.discard(par)
+                yield par, resultado
+        except queue.Empty:
+            pass
+
+        agora = time.monotonic()
+        for par in list(pendentes):
+            if par in inicios and agora - inicios[par] > timeout:
+                pendentes.discard(par)
+                _TIMEOUTS.incrementar(par=par)
+                # Busca travada costuma ser websocket caído: a thread presa segura a sessão,
+                # então o pool fecha o cliente e põe uma sessão nova no lugar
+                if hasattr(origem, "descartar"): origem.descartar(clientes[par])
+                yield par, None
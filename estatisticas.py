@@ -0,0 +1,71 @@
+import time
+import numpy as np
+import motor
+
+JANELAS_PADRAO = (20, 50, 100)
+
+# --- ESTATÍSTICA MÓVEL ---
+class EstatisticaMovel:
+    """Assertividade dos últimos N sinais (para cada N de `janelas`) e por hora do dia.
+    Cada sinal resolvido entra com `adicionar`, que custa O(len(janelas)): as contagens
+    de cada janela somam o sinal que entra e tiram o que sai, sem reler o histórico."""
+
+    def __init__(self, janelas=JANELAS_PADRAO):
+        self.janelas = tuple(sorted(set(janelas)))
+        self.total = 0
+        self.ultimo = None  # 'from' da última vela cujos sinais já foram contabilizados
+        self._anel = [0] * self.janelas[-1]
+        self._posicao = 0
+        self._vitorias = [0] * len(self.janelas)
+        self._maos = [0] * len(self.janelas)
+        self._por_hora = [[0, 0] for _ in range(24)]
+
+    def adicionar(self, desfecho, hora):
+        """Contabiliza um sinal: `desfecho` é o nível do gale que venceu (0 = mão) ou -1 (loss)."""
+        capacidade = len(self._anel)
+        for j, janela in enumerate(self.janelas):
+            if self.total >= janela:
+                saiu = self._anel[(self._posicao - janela) % capacidade]
+                self._vitorias[j] -= saiu >= 0
+                self._maos[j] -= saiu == 0
+            self._vitorias[j] += desfecho >= 0
+            self._maos[j] += desfecho == 0
+        self._anel[self._posicao] = desfecho
+        self._posicao = (self._posicao + 1) % capacidade
+        self.total += 1
+        self._por_hora[hora][0] += desfecho >= 0
+        self._por_hora[hora][1] += 1
+
+    def resumo(self):
+        janelas = {}
+        for j, janela in enumerate(self.janelas):
+            n = min(self.total, janela)
+            janelas[str(janela)] = {
+                "sinais": n,
+                "assertividade": round(self._vitorias[j] / n * 100, 2) if n else 0.0,
+                "assertividade_mao": round(self._maos[j] / n * 100, 2) if n else 0.0,
+            }
+        por_hora = [{"hora": h, "sinais": t, "assertividade": round(v / t * 100, 2)}
+                    for h, (v, t) in enumerate(self._por_hora) if t]
+        return {"sinais": self.total, "janelas": janelas, "por_hora": por_hora}
+
+# --- ATUALIZAÇÃO A PARTIR DO BUFFER ---
+def atualizar(estatisticas, velas, agora, max_gale=2, janelas=JANELAS_PADRAO):
+    """Leva para as estatísticas de cada estratégia ({nome: EstatisticaMovel}, criadas aqui
+    se faltarem) os sinais do buffer que já se resolveram (as max_gale + 1 velas seguintes
+    fecharam) e ainda não foram contados. Só olha as velas novas desde a última chamada."""
+    ts, cores = velas.timestamps(), velas.cores()
+    # Sinais em índices < limite têm todas as velas de gale fechadas em `agora`
+    limite = int(np.searchsorted(ts + velas.timeframe, agora, side='right')) - (max_gale + 1)
+    for e in motor.ESTRATEGIAS:
+        estatistica = estatisticas.get(e.nome)
+        if estatistica is None:
+            estatistica = estatisticas[e.nome] = EstatisticaMovel(janelas)
+        # Na primeira vez pula o começo do buffer, onde a janela do padrão dá a volta no array
+        inicio = motor.ALCANCE if estatistica.ultimo is None else int(np.searchsorted(ts, estatistica.ultimo, side='right'))
+        if limite <= inicio: continue
+        sinais = velas.sinais(e.nome)
+        idx = inicio + np.flatnonzero(sinais[inicio:limite])
+        for i, desfecho in zip(idx, motor.desfechos(sinais, cores, idx, max_gale)):
+            estatistica.adicionar(int(desfecho), time.localtime(int(ts[i])).tm_hour)
+        estatistica.ultimo = int(ts[limite - 1])
@@ -0,0 +1,44 @@
+import os
+import time
+
+# --- CONFIGURAÇÃO ---
+# FONTE_VELAS=iqoption (padrão) usa a API real; FONTE_VELAS=replay serve velas locais sem rede:
+#   REPLAY_DIR         diretório com arquivos gravados pelo ArquivoVelas (vazio = velas sintéticas)
+#   REPLAY_INICIO      epoch em que o replay começa (padrão: agora)
+#   REPLAY_VELOCIDADE  quantas vezes mais rápido que o tempo real o relógio do replay anda
+#   REPLAY_LATENCIA    segundos (reais) de latência por get_candles
+#   REPLAY_JITTER      variação aleatória (0..jitter segundos) somada à latência
+#   REPLAY_SEMENTE     semente das velas sintéticas
+#   REPLAY_QUEDAS      probabilidade de cada get_candles derrubar a conexão (até o próximo connect)
+# Use um REPLAY_DIR diferente do DIR_CACHE_VELAS: o catalogador grava no seu próprio cache.
+FONTE_VELAS = os.environ.get("FONTE_VELAS", "iqoption")
+
+# --- RELÓGIO ---
+class RelogioVirtual:
+    """Relógio do replay: começa em `inicio` e anda `velocidade` vezes mais rápido que o real."""
+
+    def __init__(self, inicio, velocidade=1.0):
+        self.inicio = inicio
+        self.velocidade = velocidade
+        self._t0 = time.time()
+
+    def time(self):
+        return self.inicio + (time.time() - self._t0) * self.velocidade
+
+    def sleep(self, segundos):
+        time.sleep(max(segundos, 0) / self.velocidade)
+
+if FONTE_VELAS == "replay":
+    relogio = RelogioVirtual(float(os.environ.get("REPLAY_INICIO", time.time())),
+                             float(os.environ.get("REPLAY_VELOCIDADE", 1)))
+else:
+    relogio = time
+
+# --- ABERTURA DO CLIENTE ---
+def abrir_cliente(email, senha):
+    """Cliente de velas conforme FONTE_VELAS. O iqoptionapi (ou o replay) só é importado quando usado."""
+    if FONTE_VELAS == "replay":
+        import replay
+        return replay.FonteReplay.do_ambiente()
+    from iqoptionapi.stable_api import IQ_Option
+    return IQ_Option(email, senha)
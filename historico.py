@@ -0,0 +1,107 @@
+import json
+import math
+import sqlite3
+import threading
+
+# --- ESQUEMA ---
+# Uma linha por (par, estratégia, timeframe, fechamento) recalculada. A chave primária é o
+# índice das consultas por par/estratégia num intervalo; o índice por fechamento cobre as
+# colunas das agregações, que num intervalo de todos os pares não precisam ler a tabela.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    par TEXT NOT NULL,
+    estrategia TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    fechamento INTEGER NOT NULL,
+    assertividade REAL NOT NULL,
+    vitorias INTEGER NOT NULL,
+    sinais INTEGER NOT NULL,
+    gales TEXT,
+    direcao TEXT,
+    PRIMARY KEY (par, estrategia, timeframe, fechamento)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_resultados_fechamento 
+    ON resultados (fechamento, timeframe, par, estrategia, assertividade, vitorias, sinais);
+"""
+
+# Tamanho (segundos) de cada período de agregação; "total" agrega o intervalo inteiro
+PERIODOS = {"total": None, "hora": 3600, "dia": 86400, "semana": 7 * 86400}
+
+# --- HISTÓRICO ---
+class HistoricoResultados:
+    """Resultados de cada ciclo num SQLite em modo WAL: um processo grava enquanto
+    outros (workers do gunicorn) leem sem bloquear. Cada thread usa sua conexão."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.executescript(ESQUEMA)
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = sqlite3.connect(self.caminho, timeout=10)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    def gravar(self, linhas):
+        """Grava as linhas (no formato do /api/dados, com "fechamento") numa transação."""
+        registros = []
+        for linha in linhas:
+            gales = linha.get("gales", {})
+            vitorias = sum(v for k, v in gales.items() if k != "loss")
+            registros.append((linha["par"], linha["estrategia"], linha.get("timeframe", "M1"), int(linha["fechamento"]),
+                              linha["assertividade"], vitorias, vitorias + gales.get("loss", 0),
+                              json.dumps(gales), linha.get("direcao")))
+        if not registros: return 0
+        with self._conexao() as conexao:
+            conexao.executemany("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", registros)
+        return len(registros)
+
+    def _filtros(self, par, estrategia, timeframe, inicio, fim):
+        condicoes, parametros = [], []
+        for coluna, valor in (("par", par), ("estrategia", estrategia), ("timeframe", timeframe)):
+            if valor is not None:
+                condicoes.append(f"{coluna} = ?"); parametros.append(valor)
+        if inicio is not None:
+            condicoes.append("fechamento >= ?"); parametros.append(int(inicio))
+        if fim is not None:
+            condicoes.append("fechamento < ?"); parametros.append(int(fim))
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def consultar(self, par=None, estrategia=None, timeframe=None, inicio=None, fim=None, limite=1000):
+        """Linhas gravadas no intervalo [inicio, fim), em ordem de fechamento (as `limite` mais recentes)."""
+        onde, parametros = self._filtros(par, estrategia, timeframe, inicio, fim)
+        cursor = self._conexao().execute(
+            f"SELECT * FROM resultados{onde} ORDER BY fechamento DESC LIMIT ?", parametros + [int(limite)])
+        linhas = [dict(r, gales=json.loads(r["gales"]) if r["gales"] else {}) for r in cursor]
+        return linhas[::-1]
+
+    def agregar(self, par=None, estrategia=None, timeframe=None, inicio=None, fim=None, agrupar="total"):
+        """Estatísticas por par/estratégia/timeframe (e por período, se `agrupar` for hora,
+        dia ou semana, em UTC): ciclos, média, mínima, máxima e desvio da assertividade,
+        e a assertividade ponderada pelos sinais."""
+        if agrupar not in PERIODOS:
+            raise ValueError(f"agrupar deve ser um de {list(PERIODOS)}")
+        passo = PERIODOS[agrupar]
+        periodo = f"(fechamento / {passo}) * {passo}" if passo else "MIN(fechamento)"
+        grupos = "par, estrategia, timeframe" + (", periodo" if passo else "")
+        onde, parametros = self._filtros(par, estrategia, timeframe, inicio, fim)
+        cursor = self._conexao().execute(
+            f"SELECT par, estrategia, timeframe, {periodo} AS periodo, COUNT(*) AS ciclos,"
+            f" AVG(assertividade) AS media, AVG(assertividade * assertividade) AS media_quadrados,"
+            f" MIN(assertividade) AS minima, MAX(assertividade) AS maxima,"
+            f" SUM(vitorias) AS vitorias, SUM(sinais) AS sinais"
+            f" FROM resultados{onde} GROUP BY {grupos} ORDER BY {grupos}", parametros)
+        resultado = []
+        for r in cursor:
+            r = dict(r)
+            quadrados = r.pop("media_quadrados")
+            r["desvio"] = round(math.sqrt(max(quadrados - r["media"] ** 2, 0.0)), 2)
+            r["media"] = round(r["media"], 2)
+            r["ponderada"] = round(r["vitorias"] / r["sinais"] * 100, 2) if r["sinais"] else 0.0
+            resultado.append(r)
+        return resultado
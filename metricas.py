@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import bisect
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# --- MÉTRICAS ---
+# Contadores, medidores e histogramas com rótulos, exportados no formato texto do
+# Prometheus. Cada observação é um dict lookup e uma soma sob uma trava curta.
+BALDES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _rotulos(rotulos):
+    if not rotulos: return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + "}"
+
+def _numero(valor):
+    return "+Inf" if valor == float("inf") else repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = {}
+        self._trava = threading.Lock()
+
+    def _cabecalho(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def incrementar(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self):
+        with self._trava: valores = list(self._valores.items())
+        return self._cabecalho() + [f"{self.nome}{_rotulos(k)} {_numero(v)}" for k, v in valores]
+
+class Medidor(Contador):
+    tipo = "gauge"
+
+    def definir(self, valor, **rotulos):
+        with self._trava:
+            self._valores[tuple(sorted(rotulos.items()))] = valor
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, baldes=BALDES_PADRAO):
+        super().__init__(nome, ajuda)
+        self.baldes = tuple(baldes)
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        posicao = bisect.bisect_left(self.baldes, valor)
+        with self._trava:
+            atual = self._valores.get(chave)
+            if atual is None:
+                atual = self._valores[chave] = [[0] * (len(self.baldes) + 1), 0.0, 0]
+            atual[0][posicao] += 1
+            atual[1] += valor
+            atual[2] += 1
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def exportar(self):
+        with self._trava:
+            valores = [(k, list(v[0]), v[1], v[2]) for k, v in self._valores.items()]
+        linhas = self._cabecalho()
+        for chave, contagens, soma, total in valores:
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + (float("inf"),), contagens):
+                acumulado += contagem
+                linhas.append(f"{self.nome}_bucket{_rotulos(chave + (('le', _numero(limite)),))} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(chave)} {total}")
+        return linhas
+
+class Registro:
+    """Conjunto de métricas de um processo. Pedir duas vezes o mesmo nome devolve a mesma métrica."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._trava = threading.Lock()
+
+    def _obter(self, classe, nome, *args):
+        with self._trava:
+            if nome not in self._metricas:
+                self._metricas[nome] = classe(nome, *args)
+            return self._metricas[nome]
+
+    def contador(self, nome, ajuda): return self._obter(Contador, nome, ajuda)
+    def medidor(self, nome, ajuda): return self._obter(Medidor, nome, ajuda)
+    def histograma(self, nome, ajuda, baldes=BALDES_PADRAO): return self._obter(Histograma, nome, ajuda, baldes)
+
+    def texto(self):
+        with self._trava: metricas = list(self._metricas.values())
+        return "\n".join(linha for m in metricas for linha in m.exportar()) + "\n"
+
+    def gravar(self, caminho):
+        """Grava o texto num arquivo (troca atômica), para outro processo servir."""
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".metricas-")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.texto())
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+
+REGISTRO = Registro()
+
+# --- PERFIL POR AMOSTRAGEM ---
+class Amostrador:
+    """Perfil por amostragem: a cada `intervalo` segundos anota a pilha de cada thread
+    (a do catalogador e as da coleta). `pilhas()` devolve o formato "collapsed"
+    (thread;func;func contagem) usado pelo flamegraph.pl e pelo speedscope."""
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self._contagem = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True, name="amostrador")
+
+    def _amostrar(self):
+        nomes = {}
+        while not self._parar.wait(self.intervalo):
+            for thread_id, quadro in sys._current_frames().items():
+                if thread_id == self._thread.ident: continue
+                if thread_id not in nomes:
+                    nomes = {t.ident: t.name for t in threading.enumerate()}
+                pilha = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                    quadro = quadro.f_back
+                pilha.append(nomes.get(thread_id, str(thread_id)))
+                self._contagem[";".join(reversed(pilha))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *erro):
+        self._parar.set()
+        self._thread.join()
+
+    def pilhas(self):
+        return "".join(f"{pilha} {n}\n" for pilha, n in self._contagem.most_common())
@@ -0,0 +1,290 @@
+from collections import namedtuple
+import numpy as np
+
+# --- CODIFICAÇÃO ---
+# Cores: VERDE = +1, VERMELHA = -1, DOJI = 0
+# Sinais: CALL = +1 (aposta em VERDE), PUT = -1 (aposta em VERMELHA), NONE = 0
+VERDE, VERMELHA, DOJI = 1, -1, 0
+CALL, PUT, NONE = 1, -1, 0
+
+ROTULOS_COR = {VERDE: 'VERDE', VERMELHA: 'VERMELHA', DOJI: 'DOJI'}
+ROTULOS_SINAL = {CALL: 'CALL', PUT: 'PUT', NONE: 'NONE'}
+
+def cores_das_velas(abertura, fechamento):
+    """Cor int8 de cada vela a partir dos preços de abertura e fechamento."""
+    return np.sign(np.asarray(fechamento) - np.asarray(abertura)).astype(np.int8)
+
+def fase_minuto(timestamps, timeframe=60):
+    """Minuto % 5 de cada vela. Os fusos usam deslocamentos múltiplos de 15 min,
+    então a fase local é a mesma do UTC e não depende de datetime.fromtimestamp.
+    Em timeframes maiores é a posição da vela no ciclo de 5 velas (contado em UTC)."""
+    return ((np.asarray(timestamps, dtype=np.int64) // timeframe) % 5).astype(np.int8)
+
+# --- CÓDIGOS DE PADRÃO ---
+# Uma janela de cores vira um inteiro com 2 bits por vela (cor + 1), da mais antiga para
+# a mais nova. Cada regra vira uma tabela int8 indexada por esse código com o sinal pronto,
+# então checar um padrão de 3 ou 7 velas é uma única consulta.
+def _em(c, idx, k):
+    # Equivale a df['cor'].iloc[i-k]: índices negativos dão a volta no array
+    return c[(idx - k) % len(c)]
+
+def codigo_padrao(c, idx, janela):
+    """Código da janela (deslocamentos `janela`, do mais antigo ao mais novo) em cada índice."""
+    codigo = np.zeros(len(idx), dtype=np.int32)
+    for k in janela:
+        codigo = (codigo << 2) | (_em(c, idx, k) + 1)
+    return codigo
+
+def _tabela(largura, regra):
+    tabela = np.zeros(4 ** largura, dtype=np.int8)
+    for codigo in range(4 ** largura):
+        cores = [((codigo >> 2 * (largura - 1 - j)) & 3) - 1 for j in range(largura)]
+        if 2 not in cores: tabela[codigo] = regra(cores)
+    return tabela
+
+# --- REGRAS ---
+# Cada regra recebe as cores da janela (da mais antiga para a mais nova) e devolve o sinal
+def _minoria(cores):
+    v, r = cores.count(VERDE), cores.count(VERMELHA)
+    return CALL if v < r else PUT if r < v else NONE
+
+def _maioria(cores):
+    v, r = cores.count(VERDE), cores.count(VERMELHA)
+    return CALL if v > r else PUT if r > v else NONE
+
+def _sequencia(cores):
+    # Todas da mesma cor (sem DOJI): sinal nessa cor
+    return cores[0] if cores[0] != DOJI and cores.count(cores[0]) == len(cores) else NONE
+
+def _flip(cores):
+    # Todas da mesma cor (sem DOJI): sinal contrário
+    return -_sequencia(cores)
+
+def _torres(cores):
+    # Uma vela seguida só de velas da cor oposta: sinal na cor da primeira
+    return cores[0] if cores[0] != DOJI and all(c == -cores[0] for c in cores[1:]) else NONE
+
+def _cor_da_vela(cores):
+    # Como no painel original, DOJI conta como vela vermelha (PUT)
+    return CALL if cores[0] == VERDE else PUT
+
+def _cor_sem_doji(cores):
+    # Como no cataloga original: DOJI não dá sinal
+    return cores[0]
+
+REGRAS = {
+    "minoria": _minoria, "maioria": _maioria, "sequencia": _sequencia,
+    "flip": _flip, "torres": _torres, "cor": _cor_da_vela, "cor_sem_doji": _cor_sem_doji,
+}
+
+# --- REGISTRO DE ESTRATÉGIAS ---
+# Cada estratégia é só dados: a fase (minuto % 5) da vela de gatilho (None = toda vela),
+# os deslocamentos da janela (do mais antigo ao mais novo, 0 = a vela do gatilho), a regra
+# e o primeiro índice avaliado. `registrar` compila a regra numa tabela e o avaliador é
+# uma consulta vetorizada, então uma estratégia nova não acrescenta loop por vela.
+Estrategia = namedtuple("Estrategia", "nome janela avaliador fase regra inicio")
+
+ESTRATEGIAS = []
+ALCANCE = 0  # Maior deslocamento olhado para trás por qualquer estratégia
+_tabelas = {}
+
+def tabela_da_regra(largura, regra):
+    """Tabela código -> sinal da regra para janelas de `largura` velas (compilada uma vez)."""
+    if not 0 < largura <= 15:
+        raise ValueError("a janela deve ter de 1 a 15 velas")
+    if regra not in REGRAS:
+        raise ValueError(f"regra desconhecida: {regra}")
+    chave = (largura, regra)
+    if chave not in _tabelas:
+        _tabelas[chave] = _tabela(largura, REGRAS[regra])
+    return _tabelas[chave]
+
+def compilar(nome, fase, janela, regra, inicio=0):
+    """Estratégia com o avaliador (cores, fases, idx) -> (sinal, gatilho) da declaração."""
+    janela = tuple(janela)
+    tabela = tabela_da_regra(len(janela), regra)
+
+    def avaliador(c, fases, idx):
+        gatilho = np.ones(len(idx), dtype=bool) if fase is None else fases[idx] == fase
+        if inicio: gatilho &= idx >= inicio
+        return tabela[codigo_padrao(c, idx, janela)], gatilho
+    return Estrategia(nome, janela, avaliador, fase, regra, inicio)
+
+def registrar(nome, fase, janela, regra, inicio=0):
+    """Compila e acrescenta uma estratégia ao registro compartilhado pelo painel e pelo cataloga."""
+    global ALCANCE
+    if any(e.nome == nome for e in ESTRATEGIAS):
+        raise ValueError(f"estratégia já registrada: {nome}")
+    estrategia = compilar(nome, fase, janela, regra, inicio)
+    ESTRATEGIAS.append(estrategia)
+    ALCANCE = max(ALCANCE, max(estrategia.janela))
+    return estrategia
+
+# O `inicio` reproduz o range() de cada loop original do painel
+registrar("MHI 1", 4, (2, 1, 0), "minoria")
+registrar("MHI 2", 0, (3, 2, 1), "minoria")
+registrar("MHI 3", 1, (4, 3, 2), "minoria")
+registrar("R7", 0, (7, 6), "sequencia", inicio=7)
+registrar("Torres Gemeas", None, (3, 2, 1, 0), "torres", inicio=3)
+registrar("Padrao 3x1", 3, (3, 2, 1), "minoria")
+registrar("Padrao 23", 0, (0,), "cor")
+registrar("Tres Mosqueteiros", 2, (2, 1, 0), "maioria")
+registrar("Melhor de 3", 0, (4, 3, 2), "maioria", inicio=5)
+registrar("Seven Flip", None, tuple(range(6, -1, -1)), "flip", inicio=6)
+
+def disparadas(fase_fechada):
+    """Estratégias cujo sinal ficou definido com o fechamento de uma vela dessa fase:
+    a vela mais nova da janela (menor deslocamento) é a que acabou de fechar."""
+    return [e.nome for e in ESTRATEGIAS if e.fase is None or (e.fase - min(e.janela)) % 5 == fase_fechada]
+
+def avaliar_em(cores, fase, idx, janela_completa=False):
+    """Gera (nome, sinais) de cada estratégia só nos índices `idx` (sinal NONE fora do gatilho).
+    Permite atualizar apenas as velas novas de um buffer em vez do array inteiro.
+    Com `janela_completa`, velas sem a janela inteira antes delas não dão sinal (sem dar a volta)."""
+    c = np.asarray(cores, dtype=np.int8)
+    for e in ESTRATEGIAS:
+        sinal, gatilho = e.avaliador(c, fase, idx)
+        if janela_completa: gatilho = gatilho & (idx >= max(e.janela))
+        yield e.nome, np.where(gatilho, sinal, NONE).astype(np.int8)
+
+def padroes(cores, fase, nomes=None):
+    """Cores da janela do último gatilho de cada estratégia (ou só das `nomes`),
+    como nas versões com loop."""
+    c = np.asarray(cores, dtype=np.int8)
+    n, resultado = len(c), {}
+    for e in ESTRATEGIAS:
+        if nomes is not None and e.nome not in nomes: continue
+        # O último gatilho quase sempre está nas últimas velas; só varre tudo se não estiver
+        idx = np.arange(max(n - 2 * ALCANCE, 0), n)
+        gatilhos = np.flatnonzero(e.avaliador(c, fase, idx)[1])
+        if len(gatilhos) == 0 and idx[:1].any():
+            idx = np.arange(n)
+            gatilhos = np.flatnonzero(e.avaliador(c, fase, idx)[1])
+        padrao = []
+        if len(gatilhos):
+            j = idx[gatilhos[-1]]
+            padrao = [int(c[(j - k) % n]) for k in e.janela]
+        resultado[e.nome] = padrao
+    return resultado
+
+def avaliar_estrategias(timestamps, cores, janela_completa=False, timeframe=60):
+    """Gera (nome, sinais, padrao) de todas as estratégias sem loops por linha."""
+    c = np.asarray(cores, dtype=np.int8)
+    fase = fase_minuto(timestamps, timeframe)
+    padrao = padroes(c, fase)
+    for nome, sinais in avaliar_em(c, fase, np.arange(len(c)), janela_completa):
+        yield nome, sinais, padrao[nome]
+
+# --- MATRIZ DE PARES ---
+# Todos os pares numa matriz (pares x velas), cada linha alinhada à direita (a vela mais nova
+# na última coluna) e o começo das linhas mais curtas preenchido e mascarado. Cada par segue
+# com as próprias velas e fases, então o resultado de cada linha é o mesmo da avaliação do
+# par sozinho, mas cada estratégia e a pontuação rodam uma vez para todos os pares.
+def empilhar(arrays, dtype=np.int8):
+    """(matriz, tamanhos) com os arrays de cada par alinhados à direita."""
+    tamanhos = np.array([len(a) for a in arrays], dtype=np.int64)
+    largura = int(tamanhos.max()) if len(arrays) else 0
+    matriz = np.zeros((len(arrays), largura), dtype=dtype)
+    for linha, a in zip(matriz, arrays):
+        if len(a): linha[largura - len(a):] = a
+    return matriz, tamanhos
+
+def _posicoes(tamanhos, largura):
+    # Início das velas de cada linha e a posição de cada coluna entre as velas do par
+    inicio = largura - tamanhos
+    return inicio, np.arange(largura)[None, :] - inicio[:, None]
+
+def _gatilho_matriz(e, fases, posicao):
+    gatilho = posicao >= e.inicio
+    if e.fase is not None: gatilho &= fases == e.fase
+    return gatilho
+
+def avaliar_matriz(cores, fases, tamanhos, janela_completa=False, nomes=None, estrategias=None):
+    """Gera (nome, sinais pares x velas) de cada estratégia (ou só das `nomes`), como o
+    avaliar_em de cada linha sozinha: o começo da janela dá a volta dentro das velas do par.
+    `estrategias` troca o registro por outra lista de Estrategia (de compilar)."""
+    cores, fases = np.asarray(cores, dtype=np.int8), np.asarray(fases)
+    largura = cores.shape[1]
+    inicio, posicao = _posicoes(tamanhos, largura)
+    validas = posicao >= 0
+    atras = {}  # deslocamento -> cor da vela k posições antes de cada uma
+    for e in ESTRATEGIAS if estrategias is None else estrategias:
+        if nomes is not None and e.nome not in nomes: continue
+        codigo = np.zeros(cores.shape, dtype=np.int32)
+        for k in e.janela:
+            if k not in atras:
+                colunas = inicio[:, None] + (posicao - k) % np.maximum(tamanhos, 1)[:, None]
+                atras[k] = np.take_along_axis(cores, np.minimum(colunas, largura - 1), axis=1)
+            codigo = (codigo << 2) | (atras[k] + 1)
+        gatilho = validas & _gatilho_matriz(e, fases, posicao)
+        if janela_completa: gatilho &= posicao >= max(e.janela)
+        yield e.nome, np.where(gatilho, tabela_da_regra(len(e.janela), e.regra)[codigo], NONE).astype(np.int8)
+
+def padroes_matriz(cores, fases, tamanhos, nomes=None):
+    """{nome: lista por par com as cores da janela do último gatilho}, como `padroes` em cada linha."""
+    cores, fases = np.asarray(cores, dtype=np.int8), np.asarray(fases)
+    linhas, largura = cores.shape
+    inicio, posicao = _posicoes(tamanhos, largura)
+    resultado = {}
+    for e in ESTRATEGIAS:
+        if nomes is not None and e.nome not in nomes: continue
+        gatilho = (posicao >= 0) & _gatilho_matriz(e, fases, posicao)
+        ultimo = largura - 1 - gatilho[:, ::-1].argmax(axis=1)
+        janela = np.stack([cores[np.arange(linhas), np.minimum(inicio + (ultimo - inicio - k) % np.maximum(tamanhos, 1), largura - 1)]
+                           for k in e.janela], axis=1) if linhas else np.zeros((0, len(e.janela)), dtype=np.int8)
+        resultado[e.nome] = [j.tolist() if tem else [] for j, tem in zip(janela, gatilho.any(axis=1))]
+    return resultado
+
+def pontuar_matriz(sinais, cores, max_gale=2, margem=None):
+    """`pontuar` de todas as linhas de uma vez. `sinais` é (pares x velas) ou
+    (estratégias x pares x velas) sobre as mesmas `cores` (pares x velas).
+    Retorna (vitorias [..., pares, max_gale + 1], totais [..., pares])."""
+    if margem is None: margem = max_gale + 1
+    if margem < max_gale + 1:
+        raise ValueError("margem deve cobrir as max_gale + 1 velas seguintes ao sinal")
+    sinais, cores = np.asarray(sinais), np.asarray(cores)
+    pares, largura = cores.shape
+    planos = sinais.reshape(-1, pares, largura)
+    plano, linha, coluna = np.nonzero(planos[:, :, :max(largura - margem, 0)])
+    # Mesma apuração do `desfechos`, com as velas seguintes de cada sinal na própria linha
+    acertos = cores[linha[:, None], coluna[:, None] + np.arange(1, max_gale + 2)] == planos[plano, linha, coluna][:, None]
+    nivel = np.where(acertos.any(axis=1), acertos.argmax(axis=1), max_gale + 1)
+    contagem = np.bincount((plano * pares + linha) * (max_gale + 2) + nivel, minlength=len(planos) * pares * (max_gale + 2))
+    contagem = contagem.reshape(sinais.shape[:-1] + (max_gale + 2,))
+    return contagem[..., :max_gale + 1], contagem.sum(axis=-1)
+
+def direcoes_matriz(sinais):
+    """Último sinal disparado em cada linha (NONE se nenhum)."""
+    sinais = np.asarray(sinais)
+    disparou = sinais != NONE
+    ultimo = sinais.shape[-1] - 1 - disparou[..., ::-1].argmax(axis=-1)
+    return np.where(disparou.any(axis=-1), np.take_along_axis(sinais, ultimo[..., None], axis=-1)[..., 0], NONE)
+
+# --- PONTUAÇÃO (GALES) ---
+def pontuar(sinais, cores, max_gale=2, margem=None):
+    """Conta as vitórias por nível de gale (mão, gale 1, ..., gale max_gale) numa passada.
+    Sinais nas últimas `margem` velas (padrão max_gale + 1) ficam de fora.
+    Retorna (vitorias, total); loss = total - vitorias.sum()."""
+    if margem is None: margem = max_gale + 1
+    if margem < max_gale + 1:
+        raise ValueError("margem deve cobrir as max_gale + 1 velas seguintes ao sinal")
+    sinais, cores = np.asarray(sinais), np.asarray(cores)
+    idx = np.flatnonzero(sinais[:max(len(sinais) - margem, 0)])
+    if len(idx) == 0:
+        return np.zeros(max_gale + 1, dtype=np.int64), 0
+    resultado = desfechos(sinais, cores, idx, max_gale)
+    vitorias = np.bincount(resultado[resultado >= 0], minlength=max_gale + 1)
+    return vitorias, len(idx)
+
+def desfechos(sinais, cores, idx, max_gale=2):
+    """Nível do gale em que cada sinal de `idx` venceu (0 = mão) ou -1 (loss).
+    As max_gale + 1 velas seguintes a cada sinal precisam existir."""
+    sinais, cores, idx = np.asarray(sinais), np.asarray(cores), np.asarray(idx)
+    # acertos[s, g]: a vela i+1+g do sinal s fechou na cor apostada
+    acertos = cores[idx[:, None] + np.arange(1, max_gale + 2)] == sinais[idx, None]
+    return np.where(acertos.any(axis=1), acertos.argmax(axis=1), -1)
+
+def assertividade_por_gale(vitorias, total):
+    """Assertividade (%) acumulada operando até o gale 0, 1, ..., max_gale."""
+    if total == 0: return [0.0] * len(vitorias)
+    return [round(int(v) / total * 100, 2) for v in np.cumsum(vitorias)]
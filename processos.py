@@ -0,0 +1,62 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import catalogo
+import motor
+
+# Linhas do bloco compartilhado de cada par: cores, fases e o sinal de cada estratégia
+_LINHAS = 2 + len(motor.ESTRATEGIAS)
+_LINHA_SINAL = {e.nome: 2 + j for j, e in enumerate(motor.ESTRATEGIAS)}
+
+class _VelasCompartilhadas:
+    # Mesma interface do BufferVelas usada por catalogo.processar_estrategias
+    def __init__(self, bloco): self._bloco = bloco
+    def cores(self): return self._bloco[0]
+    def fases(self): return self._bloco[1]
+    def sinais(self, nome): return self._bloco[_LINHA_SINAL[nome]]
+
+def anexar_bloco(nome):
+    """Abre num processo do pool um bloco de memória compartilhada criado pelo principal."""
+    try:
+        return SharedMemory(name=nome, track=False)
+    except TypeError:
+        # Python < 3.13 não tem track; o bloco é liberado (unlink) só pelo processo principal
+        return SharedMemory(name=nome)
+
+def _processar(nome_shm, n, par, max_gale, estrategias):
+    shm = anexar_bloco(nome_shm)
+    try:
+        bloco = np.ndarray((_LINHAS, n), dtype=np.int8, buffer=shm.buf)
+        resultado = catalogo.processar_estrategias(_VelasCompartilhadas(bloco), par, max_gale, estrategias)
+        del bloco
+        return resultado
+    finally:
+        shm.close()
+
+class CatalogoEmProcessos:
+    """Roda catalogo.processar_estrategias de cada par num pool de processos, fora do GIL
+    do servidor. As velas vão por memória compartilhada; só os resultados voltam em pickle."""
+
+    def __init__(self, workers, max_gale=2):
+        self.max_gale = max_gale
+        # spawn: fazer fork de um processo com threads (gunicorn, Flask) não é seguro
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def enviar(self, velas, par, estrategias=None):
+        """Copia cores, fases e sinais do par para um bloco compartilhado e agenda o processamento.
+        Retorna um Future com a lista de resultados do par; o bloco é liberado ao terminar."""
+        n = velas.tamanho
+        shm = SharedMemory(create=True, size=max(_LINHAS * n, 1))
+        bloco = np.ndarray((_LINHAS, n), dtype=np.int8, buffer=shm.buf)
+        bloco[0], bloco[1] = velas.cores(), velas.fases()
+        for nome, linha in _LINHA_SINAL.items():
+            bloco[linha] = velas.sinais(nome)
+        del bloco
+
+        futuro = self._executor.submit(_processar, shm.name, n, par, self.max_gale, estrategias)
+        futuro.add_done_callback(lambda _: (shm.close(), shm.unlink()))
+        return futuro
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,59 @@
+from itertools import product
+import numpy as np
+import motor
+
+# --- SINAIS POSSÍVEIS ---
+# O sinal de uma estratégia sai na vela de gatilho (a da fase dela) e a entrada é a abertura
+# da vela seguinte. Antes disso, as velas da janela que já fecharam limitam o sinal: se todo
+# jeito de completar a janela com as velas que faltam dá o mesmo sinal, a direção já está definida.
+_possiveis = {}
+
+def possiveis(regra, conhecidas):
+    """Sinais (CALL, PUT, NONE, nessa ordem) que a `regra` pode dar com as cores `conhecidas`
+    da janela, da mais antiga para a mais nova (None = vela que ainda não fechou)."""
+    chave = (regra, conhecidas)
+    if chave not in _possiveis:
+        tabela = motor.tabela_da_regra(len(conhecidas), regra)
+        faltam = [i for i, c in enumerate(conhecidas) if c is None]
+        sinais = set()
+        for cores in product((motor.VERDE, motor.VERMELHA, motor.DOJI), repeat=len(faltam)):
+            janela = list(conhecidas)
+            for i, c in zip(faltam, cores): janela[i] = c
+            codigo = 0
+            for c in janela: codigo = (codigo << 2) | (c + 1)
+            sinais.add(int(tabela[codigo]))
+        _possiveis[chave] = [s for s in (motor.CALL, motor.PUT, motor.NONE) if s in sinais]
+    return _possiveis[chave]
+
+# --- PRÓXIMAS ENTRADAS ---
+def proximas(velas, agora):
+    """Próxima entrada possível de cada estratégia no buffer `velas` (BufferVelas), com as
+    velas fechadas até `agora`. Gatilhos cujo sinal já é NONE com certeza são pulados.
+    Vazio se o buffer não tem a última vela fechada ou é curto demais para as janelas."""
+    tf = velas.timeframe
+    ts, cores = velas.timestamps(), velas.cores()
+    fechadas = int(np.searchsorted(ts + tf, agora, side='right'))
+    aberta = int(agora) // tf * tf
+    if fechadas <= motor.ALCANCE or int(ts[fechadas - 1]) != aberta - tf: return []
+    fase_aberta = int(motor.fase_minuto([aberta], tf)[0])
+    resultado = []
+    for e in motor.ESTRATEGIAS:
+        passo = 1 if e.fase is None else 5
+        adiante = 0 if e.fase is None else (e.fase - fase_aberta) % 5
+        while True:
+            # Índice que a vela de gatilho terá no buffer, sem lacunas daqui até ela
+            j = fechadas + adiante
+            conhecidas = tuple(int(cores[j - k]) if j - k < fechadas else None for k in e.janela)
+            sinais = possiveis(e.regra, conhecidas)
+            if sinais != [motor.NONE]: break
+            adiante += passo
+        gatilho = aberta + adiante * tf
+        resultado.append({
+            "estrategia": e.nome, "gatilho": gatilho, "entrada": gatilho + tf,
+            # Fechamento da vela mais nova da janela: daí em diante o sinal é conhecido
+            "definida_em": gatilho + (1 - min(e.janela)) * tf,
+            "direcao": motor.ROTULOS_SINAL[sinais[0]] if len(sinais) == 1 else None,
+            "possiveis": [motor.ROTULOS_SINAL[s] for s in sinais],
+            "padrao": [None if c is None else motor.ROTULOS_COR[c] for c in conhecidas],
+        })
+    return resultado
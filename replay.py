@@ -0,0 +1,96 @@
+import os
+import time
+import random
+import zlib
+import numpy as np
+import velas
+
+# Fonte de velas do FONTE_VELAS=replay (configurada pelas REPLAY_*, ver fonte.py). Fica fora
+# do fonte.py, que só escolhe a fonte e o relógio, para quem não usa o replay não importar o numpy
+
+# --- VELAS SINTÉTICAS ---
+def _embaralhar(x):
+    # splitmix64: cada (par, vela) vira um número pseudoaleatório fixo, sem estado
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+def _uniforme(x):
+    return (_embaralhar(x) >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+
+def velas_sinteticas(par, timestamps, semente=0):
+    """Velas determinísticas para os `timestamps` do par: a mesma vela sai igual em
+    qualquer consulta, como numa série gravada. Cerca de 5% são DOJI."""
+    ts = np.asarray(timestamps, dtype=np.int64)
+    base = np.uint64(zlib.crc32(par.encode()) ^ (semente << 32))
+    chave = ts.astype(np.uint64) * np.uint64(4) ^ base
+    abertura = 1.0 + 0.01 * _uniforme(chave)
+    movimento = _uniforme(chave + np.uint64(1)) - 0.5
+    movimento[_uniforme(chave + np.uint64(2)) < 0.05] = 0.0
+    fechamento = abertura + 0.001 * movimento
+    return {
+        'from': ts, 'open': abertura, 'close': fechamento,
+        'min': np.minimum(abertura, fechamento) - 0.0002, 'max': np.maximum(abertura, fechamento) + 0.0002,
+        'volume': np.floor(100 + 900 * _uniforme(chave + np.uint64(3))),
+    }
+
+# --- FONTE DE REPLAY ---
+class FonteReplay:
+    """Substituto offline do IQ_Option para carga e benchmark: mesmos connect, change_balance
+    e get_candles, servindo velas gravadas em disco ou sintéticas no relógio do replay."""
+
+    def __init__(self, diretorio=None, latencia=0.0, jitter=0.0, semente=0, quedas=0.0):
+        self.diretorio = diretorio
+        self.latencia = latencia
+        self.jitter = jitter
+        self.semente = semente
+        # Probabilidade de cada get_candles derrubar a conexão, para exercitar as reconexões
+        self.quedas = quedas
+        self._conectado = False
+        self._arquivos = {}
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.environ.get("REPLAY_DIR") or None,
+                   float(os.environ.get("REPLAY_LATENCIA", 0)),
+                   float(os.environ.get("REPLAY_JITTER", 0)),
+                   int(os.environ.get("REPLAY_SEMENTE", 0)),
+                   float(os.environ.get("REPLAY_QUEDAS", 0)))
+
+    def connect(self):
+        self._conectado = True
+        return True, None
+
+    def check_connect(self): return self._conectado
+    def change_balance(self, tipo): pass
+
+    def _gravadas(self, par, timeframe, quantidade, fim):
+        chave = (par, timeframe)
+        if chave not in self._arquivos:
+            self._arquivos[chave] = velas.ArquivoVelas(self.diretorio, par, timeframe)
+        registros = self._arquivos[chave].ler()
+        ate = np.searchsorted(registros['from'], fim, side='right')
+        trecho = registros[max(ate - quantidade, 0):ate]
+        return {campo: trecho[campo] for campo in trecho.dtype.names}
+
+    def get_candles(self, par, timeframe, quantidade, fim):
+        if self.latencia or self.jitter:
+            time.sleep(self.latencia + random.uniform(0, self.jitter))
+        if self.quedas and random.random() < self.quedas:
+            self._conectado = False
+        if self.quedas and not self._conectado:
+            raise ConnectionError("conexão do replay caiu")
+        if self.diretorio:
+            colunas = self._gravadas(par, timeframe, quantidade, fim)
+        else:
+            ultima = int(fim) // timeframe * timeframe
+            colunas = velas_sinteticas(par, ultima - timeframe * np.arange(quantidade - 1, -1, -1), self.semente)
+        return [
+            {'id': int(ts // timeframe), 'from': int(ts), 'to': int(ts) + timeframe,
+             'open': float(o), 'close': float(c), 'min': float(mi), 'max': float(ma), 'volume': float(v)}
+            for ts, o, c, mi, ma, v in zip(colunas['from'], colunas['open'], colunas['close'],
+                                           colunas['min'], colunas['max'], colunas['volume'])
+        ]
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+import coleta
+import metricas
+
+_CONECTADAS = metricas.REGISTRO.medidor("sessoes_conectadas", "Sessões da IQ Option saudáveis no pool.")
+_RECONEXOES = metricas.REGISTRO.contador("sessoes_reconexoes_total", "Tentativas de reconexão de sessões, por resultado.")
+
+def _fechar(api):
+    try: api.api.close()
+    except Exception: pass
+
+class _Sessao:
+    def __init__(self):
+        self.api = None
+        self.saudavel = False
+        self.em_uso = False
+        self.falhas = 0  # Reconexões seguidas que falharam
+        self.proxima = 0.0  # Quando (monotonic) tentar reconectar
+
+# --- POOL DE SESSÕES ---
+class PoolSessoes:
+    """Sessões logadas reaproveitadas entre ciclos, para o login sair do caminho do ciclo.
+    Uma thread confere a cada `intervalo` segundos se cada sessão livre segue conectada e
+    refaz o login das caídas com espera exponencial (até `espera_maxima`). As buscas pegam
+    emprestada uma sessão saudável e livre; `reportar_falha` manda a sessão para reconexão e
+    `descartar` troca a de uma busca travada por uma nova.
+    `conectar(email, senha)` devolve um cliente logado ou None, como o conectar_api."""
+
+    def __init__(self, conectar, email, senha, tamanho=1, intervalo=15, espera_maxima=60):
+        self.conectar = conectar
+        self.email, self.senha = email, senha
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._sessoes = [_Sessao() for _ in range(max(tamanho, 1))]
+        self._condicao = threading.Condition()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._vigia = threading.Thread(target=self._vigiar, daemon=True, name="sessoes")
+
+    def iniciar(self):
+        """Conecta todas as sessões em paralelo e começa a vigiá-las. Retorna quantas conectaram."""
+        threads = [threading.Thread(target=self._reconectar, args=(s,)) for s in self._sessoes]
+        for s in self._sessoes: s.em_uso = True
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self._vigia.start()
+        return self.conectadas()
+
+    def encerrar(self):
+        self._parar.set(); self._acordar.set()
+        with self._condicao:
+            for s in self._sessoes:
+                if s.api is not None: _fechar(s.api)
+                s.saudavel = False
+            self._condicao.notify_all()
+
+    def conectadas(self):
+        with self._condicao:
+            return sum(s.saudavel for s in self._sessoes)
+
+    @contextmanager
+    def emprestar(self, timeout=None):
+        """Uso exclusivo de uma sessão saudável; espera até `timeout` segundos por uma livre."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicao:
+            while True:
+                livre = next((s for s in self._sessoes if s.saudavel and not s.em_uso), None)
+                if livre is not None or self._parar.is_set(): break
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0: break
+                self._condicao.wait(restante)
+            if livre is None:
+                raise coleta.FalhaSessao("nenhuma sessão conectada disponível")
+            livre.em_uso = True
+        try:
+            yield livre.api
+        finally:
+            with self._condicao:
+                livre.em_uso = False
+                self._condicao.notify_all()
+            if not livre.saudavel: self._acordar.set()
+
+    def reportar_falha(self, api):
+        """A busca com esse cliente falhou: sai da rotação e vai para reconexão."""
+        with self._condicao:
+            for s in self._sessoes:
+                if s.api is api: s.saudavel = False
+        self._acordar.set()
+
+    def descartar(self, api):
+        """A busca com esse cliente travou: a thread presa segue com a sessão emprestada, então
+        o cliente é fechado e uma sessão nova toma o lugar dela para o vigia reconectar."""
+        with self._condicao:
+            for i, s in enumerate(self._sessoes):
+                if s.api is api:
+                    s.saudavel = False
+                    self._sessoes[i] = _Sessao()
+            self._condicao.notify_all()
+        _fechar(api)
+        self._acordar.set()
+
+    def _reservar(self, sessao):
+        with self._condicao:
+            if sessao.em_uso: return False
+            sessao.em_uso = True
+            return True
+
+    def _vigiar(self):
+        while not self._parar.is_set():
+            for s in self._sessoes:
+                if not self._reservar(s): continue
+                if s.saudavel and not coleta.conectado(s.api):
+                    with self._condicao: s.saudavel = False
+                if not s.saudavel and time.monotonic() >= s.proxima:
+                    self._reconectar(s)
+                else:
+                    with self._condicao:
+                        s.em_uso = False
+                        self._condicao.notify_all()
+            _CONECTADAS.definir(self.conectadas())
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def _reconectar(self, sessao):
+        # Chamado com a sessão reservada (em_uso); libera ao terminar
+        antiga = sessao.api
+        try:
+            api = self.conectar(self.email, self.senha)
+        except Exception:
+            api = None
+        with self._condicao:
+            if api is not None and not self._parar.is_set():
+                if antiga is not None: _fechar(antiga)
+                sessao.api, sessao.saudavel, sessao.falhas = api, True, 0
+                _RECONEXOES.incrementar(resultado="ok")
+            else:
+                sessao.falhas += 1
+                espera = min(self.espera_maxima, 2 ** sessao.falhas)
+                sessao.proxima = time.monotonic() + espera * random.uniform(0.5, 1.0)
+                _RECONEXOES.incrementar(resultado="falha")
+            sessao.em_uso = False
+            self._condicao.notify_all()
+        _CONECTADAS.definir(self.conectadas())
@@ -0,0 +1,155 @@
+import os
+import json
+import zlib
+import bisect
+import tempfile
+
+# --- SNAPSHOT ---
+class Snapshot:
+    """Uma versão publicada dos resultados, com o JSON já serializado (corpo), o ETag
+    e o evento SSE com as linhas que mudaram em relação à versão `base`. Com `indexar`,
+    também o IndiceResultados das linhas, para as consultas filtradas do /api/dados."""
+
+    def __init__(self, conteudo, corpo=None, anterior=None, indexar=False):
+        self.conteudo = conteudo
+        self.versao = conteudo.get("versao", 0)
+        self.corpo = corpo if corpo is not None else json.dumps(conteudo).encode()
+        self.etag = f"v{self.versao}-{zlib.crc32(self.corpo):08x}"
+        self.base = anterior.versao if anterior is not None else None
+        self.evento_completo = evento("snapshot", self.corpo, self.versao)
+        self.evento_delta = None
+        if anterior is not None:
+            delta = diferenca(anterior.conteudo, conteudo)
+            self.evento_delta = evento("delta", json.dumps(delta).encode(), self.versao)
+        self.indice = IndiceResultados(conteudo) if indexar else None
+
+def _chave(linha):
+    return linha.get("par"), linha.get("estrategia"), linha.get("timeframe")
+
+def diferenca(anterior, atual):
+    """Linhas (par, estratégia, timeframe) novas ou alteradas e chaves removidas entre dois conteúdos."""
+    antes = {_chave(r): r for r in anterior.get("dados", [])}
+    depois = {_chave(r): r for r in atual.get("dados", [])}
+    return {
+        "versao": atual.get("versao", 0),
+        "ultima_atualizacao": atual.get("ultima_atualizacao"),
+        "alterados": [r for k, r in depois.items() if antes.get(k) != r],
+        "removidos": [list(k) for k in antes if k not in depois],
+    }
+
+def evento(tipo, dados, versao):
+    """Mensagem server-sent-events já em bytes."""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (versao, tipo.encode(), dados)
+
+# --- ÍNDICES ---
+CAMPOS_INDICE = ("par", "estrategia", "timeframe")
+
+class IndiceResultados:
+    """Posições das linhas em ordem decrescente de assertividade (operando até cada nível
+    de gale), no total e por par, estratégia e timeframe, e cada linha já serializada.
+    Montado uma vez por versão: um filtro com top-N só corta uma dessas listas e junta os
+    bytes prontos, sem varrer nem serializar a lista inteira."""
+
+    def __init__(self, conteudo):
+        self.dados = conteudo.get("dados", [])
+        self.linhas = [json.dumps(linha).encode() for linha in self.dados]
+        self.cabecalho = {k: v for k, v in conteudo.items() if k != "dados"}
+        self.niveis = max((len(linha.get("assertividade_gales") or [0]) for linha in self.dados), default=1)
+        self._ordens = {}  # (campo, valor, gale) -> (posições, chaves negadas para o bisect)
+        for gale in range(self.niveis):
+            metrica = [self._metrica(linha, gale) for linha in self.dados]
+            ordem = sorted(range(len(self.dados)), key=lambda i: -metrica[i])
+            grupos = {(None, None): ordem}
+            for i in ordem:
+                for campo in CAMPOS_INDICE:
+                    grupos.setdefault((campo, self.dados[i].get(campo)), []).append(i)
+            for (campo, valor), posicoes in grupos.items():
+                self._ordens[(campo, valor, gale)] = (posicoes, [-metrica[i] for i in posicoes])
+
+    def _metrica(self, linha, gale):
+        gales = linha.get("assertividade_gales")
+        return gales[min(gale, len(gales) - 1)] if gales else linha.get("assertividade", 0.0)
+
+    def filtrar(self, par=None, estrategia=None, timeframe=None, minimo=None, gale=None):
+        """Posições das linhas que passam nos filtros, da maior assertividade no nível
+        `gale` (padrão: o último, que é a assertividade do painel) para a menor."""
+        gale = self.niveis - 1 if gale is None else gale
+        if not 0 <= gale < self.niveis:
+            raise ValueError(f"gale deve estar entre 0 e {self.niveis - 1}")
+        filtros = [(c, v) for c, v in zip(CAMPOS_INDICE, (par, estrategia, timeframe)) if v is not None]
+        vazio = ([], [])
+        candidatas = [self._ordens.get((c, v, gale), vazio) for c, v in filtros] or [self._ordens[(None, None, gale)]]
+        # Parte da menor lista: os demais filtros só conferem as linhas dela
+        posicoes, chaves = min(candidatas, key=lambda p: len(p[0]))
+        if minimo is not None:
+            posicoes = posicoes[:bisect.bisect_right(chaves, -minimo)]
+        if len(filtros) > 1:
+            posicoes = [i for i in posicoes if all(self.dados[i].get(c) == v for c, v in filtros)]
+        return posicoes
+
+    def corpo(self, posicoes, **extras):
+        """JSON no formato do /api/dados só com as linhas de `posicoes`."""
+        cabecalho = json.dumps(dict(self.cabecalho, **extras)).encode()
+        dados = b"[" + b", ".join(self.linhas[i] for i in posicoes) + b"]"
+        return cabecalho[:-1] + b', "dados": ' + dados + b"}"
+
+# --- PUBLICAÇÃO ---
+class PublicadorSnapshot:
+    """Publica os resultados de cada ciclo num arquivo, com número de versão crescente.
+    O arquivo novo é gravado ao lado e trocado com os.replace (atômico): quem lê vê
+    sempre o snapshot anterior inteiro ou o novo inteiro, sem precisar de trava.
+    Com `retomar`, o último snapshot publicado (de uma execução anterior) volta a ser o
+    atual: o processo serve esses resultados desde a partida, até o primeiro ciclo."""
+
+    def __init__(self, caminho, padrao, indexar=False, retomar=False):
+        self.caminho = caminho
+        self.indexar = indexar
+        # Continua a numeração do arquivo existente para os ETags não se repetirem
+        anterior = LeitorSnapshot(caminho, padrao, indexar=indexar and retomar).ler()
+        self.versao = anterior.versao
+        self.atual = anterior if retomar else Snapshot(dict(padrao, versao=self.versao), indexar=indexar)
+
+    def publicar(self, resultados):
+        self.versao += 1
+        conteudo = dict(resultados, versao=self.versao)
+        novo = Snapshot(conteudo, anterior=self.atual, indexar=self.indexar)
+        diretorio = os.path.dirname(os.path.abspath(self.caminho))
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(novo.corpo)
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+        self.atual = novo
+        return novo
+
+# --- LEITURA ---
+class LeitorSnapshot:
+    """Lê o último snapshot publicado. Só relê o arquivo quando ele foi trocado
+    (inode/mtime/tamanho mudaram); nas demais chamadas devolve o que já está em memória."""
+
+    def __init__(self, caminho, padrao, indexar=False):
+        self.caminho = caminho
+        self.indexar = indexar
+        self.padrao = Snapshot(padrao, indexar=indexar)
+        self._atual = (None, self.padrao)
+
+    def ler(self):
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return self.padrao
+        chave = (st.st_ino, st.st_mtime_ns, st.st_size)
+        atual = self._atual
+        if atual[0] != chave:
+            try:
+                with open(self.caminho, 'rb') as f:
+                    corpo = f.read()
+                atual = (chave, Snapshot(json.loads(corpo), corpo, anterior=atual[1], indexar=self.indexar))
+            except (OSError, ValueError):
+                return atual[1]
+            # Troca de referência única: leitores concorrentes veem o par antigo ou o novo
+            self._atual = atual
+        return atual[1]
@@ -0,0 +1,273 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import motor
+import processos
+import velas
+
+# --- VARREDURA DE PARÂMETROS ---
+# Avalia de uma vez a grade regra x janela x fase do gatilho x profundidade de gale em todos
+# os pares. Cores, fases e o nível de gale em que um CALL e um PUT em cada vela venceriam
+# são calculados uma vez e vão para um bloco de memória compartilhada; o pool divide as
+# janelas. O código de cada janela serve a todas as regras, e as contagens por fase e por
+# nível de gale dão todas as combinações de fase e gale sem reavaliar nada.
+Combinacao = namedtuple("Combinacao", "regra janela fase max_gale")
+
+FASES = (None, 0, 1, 2, 3, 4)  # None = gatilho em toda vela
+# Grade padrão: cobre todas as estratégias registradas (a maior janela vai até o deslocamento 7)
+GRADE_PADRAO = {"regras": tuple(motor.REGRAS), "larguras": range(1, 8), "atrasos": range(0, 7),
+                "fases": FASES, "gales": (0, 1, 2, 3)}
+DIR_CACHE_VELAS = "cache_velas"
+
+# (regra, janela, fase) -> nome, para marcar na grade as estratégias já registradas
+_REGISTRADAS = {(e.regra, e.janela, e.fase): e.nome for e in motor.ESTRATEGIAS}
+
+def janelas(larguras, atrasos):
+    """Janelas contíguas de cada largura terminando `atraso` velas antes do gatilho,
+    nos deslocamentos do motor (do mais antigo ao mais novo)."""
+    return [tuple(range(a + l - 1, a - 1, -1)) for l in larguras for a in atrasos]
+
+def grade(regras, larguras, atrasos, fases=FASES, gales=(0, 1, 2, 3)):
+    """{janela: [regras]} a avaliar e as combinações da grade. A regra "cor" só olha uma vela."""
+    for fase in fases:
+        if fase not in FASES: raise ValueError(f"fase deve ser uma de {list(FASES)}")
+    if not gales or min(gales) < 0: raise ValueError("gales deve ter níveis >= 0")
+    por_janela, combinacoes = {}, []
+    for regra in regras:
+        for janela in janelas([1] if regra == "cor" else larguras, atrasos):
+            motor.tabela_da_regra(len(janela), regra)  # valida largura e regra
+            por_janela.setdefault(janela, []).append(regra)
+            combinacoes += [Combinacao(regra, janela, fase, g) for fase in fases for g in gales]
+    return por_janela, combinacoes
+
+# --- AVALIAÇÃO ---
+def _contar_bloco(bloco, limites, tarefas, max_gale, margem):
+    # Os pares ficam lado a lado no bloco e são avaliados juntos: os índices de cada par
+    # começam depois da janela e param antes da margem, então nenhuma janela ou gale
+    # atravessa para o par vizinho. contagens[par, fase, nível]: níveis 0..max_gale são
+    # vitórias naquele gale, o último é loss.
+    cores, fases, nivel_call, nivel_put = bloco
+    niveis, resultado = max_gale + 2, {}
+    for janela, regras in tarefas:
+        faixas = [np.arange(ini + max(janela), max(fim - margem, ini + max(janela))) for ini, fim in limites]
+        idx = np.concatenate(faixas) if faixas else np.zeros(0, dtype=np.int64)
+        par = np.repeat(np.arange(len(limites)), [len(f) for f in faixas])
+        codigo = motor.codigo_padrao(cores, idx, janela)
+        for regra in regras:
+            sinais = motor.tabela_da_regra(len(janela), regra)[codigo]
+            com_sinal = np.flatnonzero(sinais)
+            posicoes = idx[com_sinal]
+            nivel = np.where(sinais[com_sinal] == motor.CALL, nivel_call[posicoes], nivel_put[posicoes])
+            grupo = (par[com_sinal] * 5 + fases[posicoes]) * niveis + nivel
+            resultado[(regra, janela)] = np.bincount(grupo, minlength=len(limites) * 5 * niveis).reshape(len(limites), 5, niveis)
+    return resultado
+
+def _varrer(nome_shm, total, limites, tarefas, max_gale, margem):
+    shm = processos.anexar_bloco(nome_shm)
+    try:
+        bloco = np.ndarray((4, total), dtype=np.int8, buffer=shm.buf)
+        resultado = _contar_bloco(bloco, limites, tarefas, max_gale, margem)
+        del bloco
+        return resultado
+    finally:
+        shm.close()
+
+def _preencher(bloco, series, limites, max_gale):
+    for (cores, fases), (ini, fim) in zip(series, limites):
+        bloco[0, ini:fim], bloco[1, ini:fim] = cores, fases
+        # Nível do gale em que uma aposta em cada vela venceria (max_gale + 1 = loss); as
+        # últimas velas ficam como loss, mas a margem as deixa de fora
+        bloco[2:, ini:fim] = max_gale + 1
+        idx = np.arange(max(len(cores) - max_gale - 1, 0))
+        for linha, sinal in ((2, motor.CALL), (3, motor.PUT)):
+            nivel = motor.desfechos(np.full(len(cores), sinal, dtype=np.int8), cores, idx, max_gale)
+            bloco[linha, ini:ini + len(idx)] = np.where(nivel < 0, max_gale + 1, nivel)
+
+def contar(series, por_janela, max_gale, margem, workers=0):
+    """{(regra, janela): contagens (par, fase, nível)} de todas as janelas da grade.
+    `series` é uma lista de (cores, fases); com `workers` > 0, roda num pool de processos."""
+    limites, inicio = [], 0
+    for cores, _ in series:
+        limites.append((inicio, inicio + len(cores))); inicio += len(cores)
+    tarefas = list(por_janela.items())
+    if not workers:
+        bloco = np.zeros((4, inicio), dtype=np.int8)
+        _preencher(bloco, series, limites, max_gale)
+        return _contar_bloco(bloco, limites, tarefas, max_gale, margem)
+
+    shm = SharedMemory(create=True, size=max(4 * inicio, 1))
+    try:
+        bloco = np.ndarray((4, inicio), dtype=np.int8, buffer=shm.buf)
+        _preencher(bloco, series, limites, max_gale)
+        del bloco
+        # Algumas tarefas por processo, para as janelas largas não deixarem núcleos parados no fim
+        partes = [tarefas[i::workers * 4] for i in range(min(workers * 4, len(tarefas)))]
+        resultado = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for parte in executor.map(_varrer, *zip(*[(shm.name, inicio, limites, p, max_gale, margem) for p in partes])):
+                resultado.update(parte)
+        return resultado
+    finally:
+        shm.close(); shm.unlink()
+
+def varrer(series, regras=GRADE_PADRAO["regras"], larguras=GRADE_PADRAO["larguras"], atrasos=GRADE_PADRAO["atrasos"],
+           fases=GRADE_PADRAO["fases"], gales=GRADE_PADRAO["gales"], minimo_sinais=1, top=None, workers=0):
+    """Pontua toda a grade em `series` ({par: (cores, fases)}) e devolve as combinações da
+    maior para a menor assertividade somando os pares, com o detalhe por par. Os sinais das
+    últimas max(gales) + 1 velas ficam de fora em todas, para os gales compararem os mesmos sinais."""
+    por_janela, combinacoes = grade(regras, larguras, atrasos, fases, gales)
+    pares = list(series)
+    max_gale = max(gales)
+    contagens = contar([series[p] for p in pares], por_janela, max_gale, max_gale + 1, workers)
+
+    linhas = []
+    for c in combinacoes:
+        por_fase = contagens[(c.regra, c.janela)]
+        por_fase = por_fase.sum(axis=1) if c.fase is None else por_fase[:, c.fase]
+        # Com gale g, vence quem venceu até o nível g; o resto (inclusive os níveis acima) é loss
+        vitorias, sinais = por_fase[:, :c.max_gale + 1].sum(axis=1), por_fase.sum(axis=1)
+        total = int(sinais.sum())
+        if total < minimo_sinais: continue
+        linhas.append((int(vitorias.sum()) / total, c, vitorias, sinais))
+    linhas.sort(key=lambda l: l[0], reverse=True)
+
+    resultado = []
+    for taxa, c, vitorias, sinais in linhas[:top]:
+        resultado.append({
+            "regra": c.regra, "janela": list(c.janela), "fase": c.fase, "max_gale": c.max_gale,
+            "estrategia": _REGISTRADAS.get((c.regra, c.janela, c.fase)),
+            "assertividade": round(taxa * 100, 2), "vitorias": int(vitorias.sum()), "sinais": int(sinais.sum()),
+            "por_par": {p: {"assertividade": round(int(v) / int(s) * 100, 2) if s else 0.0, "sinais": int(s)}
+                        for p, v, s in zip(pares, vitorias, sinais)},
+        })
+    return resultado
+
+# --- CONFERÊNCIA ---
+def conferir(series, amostras, semente=0, workers=0, **grade_kwargs):
+    """Refaz, par a par, `amostras` combinações sorteadas do varrer com motor.compilar e
+    motor.pontuar. Retorna a lista de divergências (vazia se tudo bate)."""
+    kwargs = dict(GRADE_PADRAO, **grade_kwargs)
+    margem = max(kwargs["gales"]) + 1
+    resultado = varrer(series, workers=workers, **kwargs)
+    sorteio = np.random.default_rng(semente).choice(len(resultado), min(amostras, len(resultado)), replace=False)
+    divergencias = []
+    for r in (resultado[i] for i in sorteio):
+        e = motor.compilar("conferência", r["fase"], r["janela"], r["regra"])
+        vitorias = sinais_total = 0
+        for par, (cores, fases) in series.items():
+            idx = np.arange(max(e.janela), len(cores))
+            sinal, gatilho = e.avaliador(cores, fases, idx)
+            sinais = np.zeros(len(cores), dtype=np.int8)
+            sinais[idx] = np.where(gatilho, sinal, motor.NONE)
+            v, total = motor.pontuar(sinais, cores, r["max_gale"], margem)
+            vitorias, sinais_total = vitorias + int(v.sum()), sinais_total + total
+            if r["por_par"][par]["sinais"] != total:
+                divergencias.append(f"{r['regra']} {tuple(r['janela'])} fase {r['fase']} gale {r['max_gale']} ({par})")
+        if (r["vitorias"], r["sinais"]) != (vitorias, sinais_total):
+            divergencias.append(f"{r['regra']} {tuple(r['janela'])} fase {r['fase']} gale {r['max_gale']}")
+    return divergencias
+
+# --- VELAS ---
+def pares_em_cache(diretorio, timeframe=60):
+    return sorted(os.path.basename(p)[:-len(f"_{timeframe}.bin")] for p in glob.glob(os.path.join(diretorio, f"*_{timeframe}.bin")))
+
+def carregar_series(diretorio, pares, timeframe=60, quantidade=None):
+    """{par: (cores, fases)} das últimas `quantidade` velas gravadas em disco pelo catalogador.
+    Timeframes maiores são montados das velas M1, como no painel."""
+    series = {}
+    for par in pares:
+        arquivo = velas.ArquivoVelas(diretorio, par, 60)
+        if quantidade is None: registros = arquivo.ler()
+        else: registros = arquivo.ler(quantidade * timeframe // 60 + timeframe // 60)
+        colunas = velas.reamostrar(registros, timeframe, descartar_inicio=True) if timeframe != 60 else registros
+        ts = np.asarray(colunas['from'][-quantidade:] if quantidade else colunas['from'])
+        if len(ts) == 0: continue
+        abertura, fechamento = (np.asarray(colunas[campo][-len(ts):]) for campo in ('open', 'close'))
+        series[par] = (motor.cores_das_velas(abertura, fechamento), motor.fase_minuto(ts, timeframe))
+    return series
+
+# --- EXECUÇÃO ---
+def _lista(texto, tipo=int):
+    # "1-7", "0,2,4" ou "todas" (fase None)
+    valores = []
+    for parte in str(texto).split(","):
+        parte = parte.strip()
+        if parte == "todas": valores.append(None)
+        elif "-" in parte[1:]:
+            a, b = parte.split("-", 1); valores += list(range(int(a), int(b) + 1))
+        elif parte: valores.append(tipo(parte))
+    return valores
+
+def parametros(dados):
+    """Argumentos do varrer a partir do corpo JSON do /api/varredura (listas ou textos como
+    "1-7"), já validados contra a grade. Levanta ValueError."""
+    kwargs = {}
+    try:
+        for chave, tipo in (("regras", str), ("larguras", int), ("atrasos", int), ("fases", int), ("gales", int)):
+            if chave not in dados: continue
+            valor = dados[chave]
+            kwargs[chave] = _lista(valor, tipo) if isinstance(valor, str) else [v if v is None else tipo(v) for v in valor]
+        for chave in ("minimo_sinais", "top"):
+            if dados.get(chave) is not None: kwargs[chave] = int(dados[chave])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"parâmetro inválido: {e}")
+    grade(**{chave: kwargs.get(chave, valor) for chave, valor in GRADE_PADRAO.items()})
+    return kwargs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros das estratégias sobre as velas em cache.")
+    parser.add_argument("--dir", default=DIR_CACHE_VELAS, help="diretório das velas gravadas pelo catalogador")
+    parser.add_argument("--pares", default="", help="lista separada por vírgula (padrão: todos do cache)")
+    parser.add_argument("--timeframe", type=int, default=60, help="segundos; maiores que 60 são montados das M1")
+    parser.add_argument("--velas", type=int, default=None, help="últimas N velas de cada par (padrão: todas)")
+    parser.add_argument("--regras", default=",".join(motor.REGRAS))
+    parser.add_argument("--larguras", default="1-7", help="quantidade de velas da janela")
+    parser.add_argument("--atrasos", default="0-6", help="velas entre a mais nova da janela e o gatilho")
+    parser.add_argument("--fases", default="todas,0-4", help="minuto %% 5 do gatilho ('todas' = toda vela)")
+    parser.add_argument("--gales", default="0-3")
+    parser.add_argument("--minimo-sinais", type=int, default=20)
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="0 = no próprio processo")
+    parser.add_argument("--saida", default=None, help="grava o resultado (top) em JSON")
+    parser.add_argument("--conferir", type=int, default=0, help="refaz N combinações sorteadas com o motor (0 desliga)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do sorteio do --conferir")
+    args = parser.parse_args(argv)
+
+    pares = _lista(args.pares, str) or pares_em_cache(args.dir)
+    series = carregar_series(args.dir, pares, args.timeframe, args.velas)
+    if not series:
+        print(f"Nenhuma vela em {args.dir} para {', '.join(pares) or 'nenhum par'}.")
+        return 1
+    grade_args = {"regras": _lista(args.regras, str), "larguras": _lista(args.larguras), "atrasos": _lista(args.atrasos),
+                  "fases": _lista(args.fases), "gales": _lista(args.gales)}
+    inicio = time.perf_counter()
+    try:
+        resultado = varrer(series, minimo_sinais=args.minimo_sinais, top=args.top, workers=args.processos, **grade_args)
+    except ValueError as e:
+        print(f"Parâmetros inválidos: {e}")
+        return 2
+    velas_total = sum(len(c) for c, _ in series.values())
+    print(f"{len(series)} pares, {velas_total} velas, varredura em {time.perf_counter() - inicio:.2f} s\n")
+    print(f"{'regra':<10} {'janela':<22} {'fase':>5} {'gale':>4} {'assert.':>8} {'sinais':>7}  estratégia")
+    for r in resultado:
+        fase = "todas" if r["fase"] is None else r["fase"]
+        print(f"{r['regra']:<10} {str(tuple(r['janela'])):<22} {fase:>5} {r['max_gale']:>4} "
+              f"{r['assertividade']:>7.2f}% {r['sinais']:>7}  {r['estrategia'] or ''}")
+    if args.saida:
+        with open(args.saida, 'w') as f: json.dump(resultado, f, indent=1)
+    if args.conferir:
+        divergencias = conferir(series, args.conferir, args.semente, args.processos, **grade_args)
+        print(f"\nConferência de {args.conferir} combinações: {'OK' if not divergencias else 'DIVERGE em ' + ', '.join(divergencias)}")
+        if divergencias: return 3
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
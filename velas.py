@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+import numpy as np
+import metricas
+import motor
+
+CAMPOS = ('open', 'close', 'min', 'max', 'volume')
+
+_TEMPO_AVALIACAO = metricas.REGISTRO.histograma(
+    "catalogador_avaliacao_segundos", "Tempo de avaliação dos sinais de cada estratégia nas velas novas.")
+
+def _colunas(velas_raw):
+    # Aceita a lista de dicts do get_candles, um array estruturado (arquivo em disco)
+    # ou um dict de colunas (velas reamostradas)
+    if isinstance(velas_raw, dict): return velas_raw
+    if getattr(velas_raw, 'dtype', None) is not None and velas_raw.dtype.names:
+        return {campo: np.asarray(velas_raw[campo]) for campo in ('from',) + CAMPOS}
+    return {campo: np.array([v[campo] for v in velas_raw], dtype=np.int64 if campo == 'from' else np.float64)
+            for campo in ('from',) + CAMPOS}
+
+def reamostrar(velas_raw, timeframe, descartar_inicio=False):
+    """Agrupa velas menores (M1) em velas de `timeframe` segundos: abertura da primeira,
+    fechamento da última, mínima e máxima do grupo e volume somado. As velas devem vir
+    em ordem; o último grupo pode estar incompleto (vela em formação). Com
+    `descartar_inicio`, o primeiro grupo sai se o histórico começa no meio dele."""
+    colunas = _colunas(velas_raw)
+    grupo = colunas['from'] // timeframe * timeframe
+    if len(grupo) == 0: return {campo: colunas[campo][:0] for campo in ('from',) + CAMPOS}
+    inicios = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+    if descartar_inicio and colunas['from'][0] != grupo[0]:
+        inicios = inicios[1:]
+        if len(inicios) == 0: return {campo: colunas[campo][:0] for campo in ('from',) + CAMPOS}
+    fins = np.r_[inicios[1:], len(grupo)] - 1
+    return {
+        'from': grupo[inicios], 'open': colunas['open'][inicios], 'close': colunas['close'][fins],
+        'min': np.minimum.reduceat(colunas['min'], inicios), 'max': np.maximum.reduceat(colunas['max'], inicios),
+        'volume': np.add.reduceat(colunas['volume'], inicios),
+    }
+
+# --- BUFFER CIRCULAR DE VELAS ---
+class BufferVelas:
+    """Últimas `capacidade` velas de um par em arrays circulares, indexadas pelo 'from'.
+    Cores, fases e sinais são calculados só para as velas que entram."""
+
+    def __init__(self, capacidade, timeframe=60):
+        self.capacidade = capacidade
+        self.timeframe = timeframe
+        self.inicio = 0
+        self.tamanho = 0
+        self._timestamps = np.zeros(capacidade, dtype=np.int64)
+        self._campos = {campo: np.zeros(capacidade) for campo in CAMPOS}
+        self._cores = np.zeros(capacidade, dtype=np.int8)
+        self._fases = np.zeros(capacidade, dtype=np.int8)
+        self._sinais = {e.nome: np.zeros(capacidade, dtype=np.int8) for e in motor.ESTRATEGIAS}
+
+    @property
+    def ultimo_timestamp(self):
+        if self.tamanho == 0: return None
+        return int(self._timestamps[(self.inicio + self.tamanho - 1) % self.capacidade])
+
+    def _ordenado(self, arr):
+        if self.inicio + self.tamanho <= self.capacidade:
+            return arr[self.inicio:self.inicio + self.tamanho]
+        return np.concatenate((arr[self.inicio:], arr[:(self.inicio + self.tamanho) % self.capacidade]))
+
+    def timestamps(self): return self._ordenado(self._timestamps)
+    def cores(self): return self._ordenado(self._cores)
+    def fases(self): return self._ordenado(self._fases)
+    def campo(self, nome): return self._ordenado(self._campos[nome])
+    def sinais(self, nome): return self._ordenado(self._sinais[nome])
+
+    def colunas(self, desde=None):
+        """As velas guardadas (a partir do 'from' `desde`) como dict de colunas."""
+        ts = self.timestamps()
+        inicio = 0 if desde is None else np.searchsorted(ts, desde)
+        return dict({'from': ts[inicio:]}, **{campo: self.campo(campo)[inicio:] for campo in CAMPOS})
+
+    def anexar(self, velas_raw):
+        """Grava as velas (do get_candles ou do arquivo) mais novas que as já guardadas,
+        descartando as mais antigas. A última vela guardada (que pode estar em formação)
+        é sobrescrita se vier de novo. Retorna quantas velas do fim foram gravadas."""
+        colunas = _colunas(velas_raw)
+        ts = colunas['from']
+        ultimo = self.ultimo_timestamp
+        novas = np.flatnonzero(ts >= ultimo) if ultimo is not None else np.arange(len(ts))
+        novas = novas[-self.capacidade:]
+        if len(novas) == 0: return 0
+
+        sobrescreve = ultimo is not None and ts[novas[0]] == ultimo
+        entram = len(novas) - sobrescreve
+        despejadas = max(self.tamanho + entram - self.capacidade, 0)
+        self.inicio = (self.inicio + despejadas) % self.capacidade
+        self.tamanho += entram - despejadas
+
+        # Posições físicas das velas gravadas, sempre no fim da ordem lógica
+        fisico = (self.inicio + np.arange(self.tamanho - len(novas), self.tamanho)) % self.capacidade
+        self._timestamps[fisico] = ts[novas]
+        for campo in CAMPOS:
+            self._campos[campo][fisico] = colunas[campo][novas]
+        self._cores[fisico] = motor.cores_das_velas(self._campos['open'][fisico], self._campos['close'][fisico])
+        self._fases[fisico] = motor.fase_minuto(ts[novas], self.timeframe)
+        self._atualizar_sinais(len(novas))
+        return len(novas)
+
+    def _atualizar_sinais(self, gravadas):
+        # Velas no começo da janela olham "para trás" dando a volta no array (como o
+        # .iloc[i-k] original), então mudam quando o tamanho ou o início mudam
+        n = self.tamanho
+        idx = np.union1d(np.arange(min(motor.ALCANCE, n)), np.arange(n - gravadas, n))
+        fisico = (self.inicio + idx) % self.capacidade
+        inicio = time.perf_counter()
+        for nome, sinais in motor.avaliar_em(self.cores(), self.fases(), idx):
+            self._sinais[nome][fisico] = sinais
+            agora = time.perf_counter()
+            _TEMPO_AVALIACAO.observar(agora - inicio, estrategia=nome)
+            inicio = agora
+
+# --- ARQUIVO EM DISCO ---
+class ArquivoVelas:
+    """Velas fechadas de um par/timeframe num arquivo binário de registros de largura fixa,
+    acrescentado pelo buscador e lido via memmap (sem carregar o arquivo na memória)."""
+
+    DTYPE = np.dtype([('from', '<i8'), ('open', '<f8'), ('close', '<f8'),
+                      ('min', '<f8'), ('max', '<f8'), ('volume', '<f8')])
+
+    def __init__(self, diretorio, par, timeframe):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{par}_{timeframe}.bin")
+        self.timeframe = timeframe
+        self._trava = threading.Lock()
+        self.ultimo_timestamp = None
+        # Abrir não mexe no arquivo: leitores (varredura, replay) abrem o cache enquanto o
+        # catalogador grava, e o registro incompleto no fim fica de fora até o gravar reparar
+        if len(self):
+            self.ultimo_timestamp = int(self.ler(1)['from'][0])
+
+    def __len__(self):
+        if not os.path.exists(self.caminho): return 0
+        return os.path.getsize(self.caminho) // self.DTYPE.itemsize
+
+    def ler(self, quantidade=None):
+        """As últimas `quantidade` velas (todas se None) como array estruturado mapeado do disco."""
+        n = len(self)
+        if n == 0: return np.zeros(0, dtype=self.DTYPE)
+        registros = np.memmap(self.caminho, dtype=self.DTYPE, mode='r', shape=(n,))
+        return registros if quantidade is None else registros[-quantidade:]
+
+    def gravar(self, velas_raw, agora):
+        """Acrescenta as velas já fechadas em `agora` e mais novas que a última gravada."""
+        colunas = _colunas(velas_raw)
+        with self._trava:
+            fechadas = colunas['from'] + self.timeframe <= agora
+            if self.ultimo_timestamp is not None:
+                fechadas &= colunas['from'] > self.ultimo_timestamp
+            ts, posicoes = np.unique(colunas['from'][fechadas], return_index=True)
+            if len(ts) == 0: return 0
+            registros = np.zeros(len(ts), dtype=self.DTYPE)
+            for campo in self.DTYPE.names:
+                registros[campo] = colunas[campo][fechadas][posicoes]
+            with open(self.caminho, 'ab') as f:
+                # Só o gravador repara: descarta o registro incompleto de uma gravação interrompida
+                resto = f.tell() % self.DTYPE.itemsize
+                if resto: f.truncate(f.tell() - resto)
+                f.write(registros.tobytes())
+            self.ultimo_timestamp = int(ts[-1])
+            return len(ts)